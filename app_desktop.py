@@ -27,6 +27,7 @@ from src.models.action import Action, ActionType
 from src.models.intent import Intent
 from src.models.knowledge import KnowledgeGraph
 from src.models.session import UserProfile
+from src.models.task import TaskStep
 from src.services.asr_service import ASRConfig, ASRService, AudioCapture
 from src.services.embedding_service import EmbeddingService
 from src.services.executor_service import ExecutorService
@@ -35,6 +36,10 @@ from src.services.planner_service import PlannerService
 from src.services.safety_service import SafetyService
 from src.services.tts_service import TTSService
 from src.services.vision_service import ScreenAnalysis, VisionService, VLConfig
+from src.utils import http_utils
+
+# 浏览器类应用关键词（目标应用与当前应用都按子串匹配）
+_BROWSER_KEYWORDS = ("浏览器", "edge", "chrome", "firefox", "360", "browser")
 
 
 class SignalBridge(QObject):
@@ -178,6 +183,7 @@ class ElderlyAgent:
                     await asyncio.wait_for(svc.close(), timeout=2.0)
                 except Exception as e:
                     logger.warning(f"关闭服务 {type(svc).__name__} 时出错或超时: {e}")
+        await http_utils.close_shared_client()
 
         # 3. 【新增】取消当前 Loop 中所有未完成的任务 (防止挂起)
         try:
@@ -310,6 +316,9 @@ class ElderlyAgent:
             else:
                 logger.info("[RAG搜索] 未找到相关结果")
 
+            # 规划所需的知识检索与屏幕分析并发进行
+            self._planner.prefetch_knowledge(intent)
+
             # ========== 屏幕分析（需要intent结果）==========
             self._signals.status_changed.emit("分析屏幕...")
             screen_state = await self._vision.analyze_screen_state(
@@ -341,6 +350,9 @@ class ElderlyAgent:
             await self._tts.speak_error(str(e))
             self._signals.status_changed.emit("出错")
         finally:
+            # 流程提前结束（意图不明确、截屏失败等）时取消未被取用的知识预取
+            if self._planner:
+                self._planner.cancel_prefetch()
             self._reset_idle_timer()
             self._signals.processing_done.emit()
 
@@ -368,6 +380,8 @@ class ElderlyAgent:
             plan = await self._planner.create_plan(
                 intent=intent,
                 screen_analysis=current_screen,
+                # 重规划时上一个计划已失败，不能再从缓存取回同一计划
+                use_cache=replan_count == 0,
             )
             plan_time = time.time() - plan_start
             logger.info(f"[规划] 计划生成完成，耗时: {plan_time:.2f}s，共 {len(plan.steps)} 步")
@@ -387,6 +401,14 @@ class ElderlyAgent:
                 self._signals.status_changed.emit("完成")
                 return
 
+            # 预先合成各步骤语音：播报当前步骤时后续步骤已在合成
+            step_messages = [
+                "" if step.action and step.action.action_type == ActionType.DONE
+                else self._format_step_message(step)
+                for step in plan.steps
+            ]
+            step_audio = self._tts.prefetch(step_messages)
+
             # 播报计划概要
             total_steps = len([s for s in plan.steps if s.action and s.action.action_type != ActionType.DONE])
             if total_steps > 1:
@@ -396,85 +418,90 @@ class ElderlyAgent:
             self._signals.status_changed.emit("执行中...")
             execution_success = True
 
-            for step_idx, step in enumerate(plan.steps):
-                self._reset_idle_timer()
+            try:
+                for step_idx, step in enumerate(plan.steps):
+                    self._reset_idle_timer()
 
-                # 检查是否是完成步骤
-                if step.action and step.action.action_type == ActionType.DONE:
-                    await self._tts.speak_success("任务完成！")
-                    self._signals.status_changed.emit("完成")
-                    return
-
-                # 播报当前步骤
-                step_msg = step.friendly_instruction
-                if not step_msg or len(step_msg) > 40:
-                    step_msg = self._format_action_message(step.action)
-
-                logger.info(f"[执行] 步骤 {step_idx + 1}/{len(plan.steps)}: {step_msg}")
-                self._signals.status_changed.emit(f"步骤 {step_idx + 1}: {step_msg[:20]}...")
-                await self._tts.speak(step_msg)
-
-                # 等待用户操作
-                await asyncio.sleep(2.5)
-
-                # ========== 3. 观察执行结果 ==========
-                new_screenshot, _ = await self._vision.capture_screen()
-                if new_screenshot:
-                    new_state = await self._vision.analyze_screen_state(
-                        new_screenshot,
-                        user_intent=intent.normalized_text
-                    )
-                    new_screen = ScreenAnalysis(
-                        app_name=new_state.app_name,
-                        screen_type=new_state.screen_state,
-                        description=new_state.description,
-                    )
-                    logger.info(f"[观察] 当前屏幕: {new_state.app_name} - {new_state.screen_state}")
-
-                    # ========== 4. 验证执行结果 ==========
-                    # 检查是否已经达到目标状态
-                    task_goal = (intent.target_state or "").strip() or intent.normalized_text or intent.raw_text
-                    goal_achieved, goal_reason = await self._vision.check_goal_achieved(
-                        task_goal=task_goal,
-                        screenshot=new_screenshot,
-                        screen_state=new_state,
-                    )
-                    if goal_achieved:
-                        if goal_reason:
-                            logger.info(f"[完成判定] {goal_reason}")
+                    # 检查是否是完成步骤
+                    if step.action and step.action.action_type == ActionType.DONE:
                         await self._tts.speak_success("任务完成！")
                         self._signals.status_changed.emit("完成")
                         return
 
-                    # 检查是否需要重规划（屏幕状态与预期不符）
-                    expected_result = step.expected_result or ""
-                    if expected_result:
-                        step_desc = step.friendly_instruction or step.description or step_msg
-                        step_ok, step_changes, step_reason = await self._vision.verify_step_completion(
-                            before_screenshot=current_screenshot,
-                            after_screenshot=new_screenshot,
-                            step_description=step_desc,
-                            expected_result=expected_result,
+                    # 播报当前步骤
+                    step_msg = step_messages[step_idx]
+
+                    logger.info(f"[执行] 步骤 {step_idx + 1}/{len(plan.steps)}: {step_msg}")
+                    self._signals.status_changed.emit(f"步骤 {step_idx + 1}: {step_msg[:20]}...")
+                    await self._tts.speak_prefetched(step_audio[step_idx])
+
+                    # 等待用户操作
+                    await asyncio.sleep(2.5)
+
+                    # ========== 3. 观察执行结果 ==========
+                    new_screenshot, _ = await self._vision.capture_screen()
+                    if new_screenshot:
+                        new_state = await self._vision.analyze_screen_state(
+                            new_screenshot,
+                            user_intent=intent.normalized_text
+                        )
+                        new_screen = ScreenAnalysis(
+                            app_name=new_state.app_name,
+                            screen_type=new_state.screen_state,
+                            description=new_state.description,
                         )
-                        if step_changes:
-                            logger.info(f"[步骤变化] {step_changes}")
-                        if not step_ok:
-                            logger.warning(f"[验证] 步骤结果与预期不符，预期: {expected_result}")
-                            if step_reason:
-                                logger.warning(f"[验证] 原因: {step_reason}")
-                            logger.warning(f"[验证] 实际屏幕: {new_state.description[:100]}")
-
-                            # 如果还有重规划机会，触发重规划
-                            if replan_count < max_replan_attempts:
-                                await self._tts.speak("操作结果和预期不太一样，让我重新规划")
-                                current_screen = new_screen
-                                current_screenshot = new_screenshot
-                                execution_success = False
-                                break
-
-                    # 更新当前屏幕状态
-                    current_screen = new_screen
-                    current_screenshot = new_screenshot
+                        logger.info(f"[观察] 当前屏幕: {new_state.app_name} - {new_state.screen_state}")
+
+                        # ========== 4. 验证执行结果 ==========
+                        # 检查是否已经达到目标状态
+                        task_goal = (intent.target_state or "").strip() or intent.normalized_text or intent.raw_text
+                        goal_achieved, goal_reason = await self._vision.check_goal_achieved(
+                            task_goal=task_goal,
+                            screenshot=new_screenshot,
+                            screen_state=new_state,
+                        )
+                        if goal_achieved:
+                            if goal_reason:
+                                logger.info(f"[完成判定] {goal_reason}")
+                            await self._tts.speak_success("任务完成！")
+                            self._signals.status_changed.emit("完成")
+                            return
+
+                        # 检查是否需要重规划（屏幕状态与预期不符）
+                        expected_result = step.expected_result or ""
+                        if expected_result:
+                            step_desc = step.friendly_instruction or step.description or step_msg
+                            step_ok, step_changes, step_reason = await self._vision.verify_step_completion(
+                                before_screenshot=current_screenshot,
+                                after_screenshot=new_screenshot,
+                                step_description=step_desc,
+                                expected_result=expected_result,
+                            )
+                            if step_changes:
+                                logger.info(f"[步骤变化] {step_changes}")
+                            if not step_ok:
+                                # 失败的计划不能留在缓存里，否则用户重试同一请求时又拿到它
+                                self._planner.invalidate_last_plan()
+                                logger.warning(f"[验证] 步骤结果与预期不符，预期: {expected_result}")
+                                if step_reason:
+                                    logger.warning(f"[验证] 原因: {step_reason}")
+                                logger.warning(f"[验证] 实际屏幕: {new_state.description[:100]}")
+
+                                # 如果还有重规划机会，触发重规划
+                                if replan_count < max_replan_attempts:
+                                    await self._tts.speak("操作结果和预期不太一样，让我重新规划")
+                                    current_screen = new_screen
+                                    current_screenshot = new_screenshot
+                                    execution_success = False
+                                    break
+
+                        # 更新当前屏幕状态
+                        current_screen = new_screen
+                        current_screenshot = new_screenshot
+            finally:
+                # 提前返回或重规划时取消尚未用到的合成任务
+                for audio_task in step_audio:
+                    audio_task.cancel()
 
             # 如果执行成功完成所有步骤
             if execution_success:
@@ -495,6 +522,7 @@ class ElderlyAgent:
                     await self._tts.speak_success("任务完成！")
                     self._signals.status_changed.emit("完成")
                 else:
+                    self._planner.invalidate_last_plan()
                     await self._tts.speak("操作步骤已完成，请检查是否达到您的目标")
                     self._signals.status_changed.emit("已完成步骤")
                 return
@@ -515,9 +543,8 @@ class ElderlyAgent:
             current_app = screen.app_name.lower()
 
             # 浏览器类应用特殊处理
-            browser_keywords = ["浏览器", "edge", "chrome", "firefox", "360", "browser"]
-            if any(kw in target_app for kw in browser_keywords):
-                if any(kw in current_app for kw in browser_keywords):
+            if any(kw in target_app for kw in _BROWSER_KEYWORDS):
+                if any(kw in current_app for kw in _BROWSER_KEYWORDS):
                     return True
             elif target_app in current_app or current_app in target_app:
                 return True
@@ -551,6 +578,13 @@ class ElderlyAgent:
         match_count = sum(1 for kw in keywords if kw in current_state)
         return match_count >= len(keywords) * 0.3  # 30%匹配即认为符合预期
 
+    def _format_step_message(self, step: TaskStep) -> str:
+        """步骤的播报文本（友好描述过长时改用简洁的动作描述）"""
+        step_msg = step.friendly_instruction
+        if not step_msg or len(step_msg) > 40:
+            step_msg = self._format_action_message(step.action)
+        return step_msg
+
     def _format_action_message(self, action: Action) -> str:
         """格式化动作为简洁的语音输出（只描述动作本身）"""
         if not action:
@@ -24,6 +24,7 @@ from ..services.llm_service import LLMService
 from ..services.planner_service import PlannerService
 from ..services.safety_service import SafetyService, SafetyCheckResult
 from ..services.embedding_service import EmbeddingService
+from ..utils import http_utils
 from .executor import ActionExecutor
 
 
@@ -136,6 +137,7 @@ class ElderlyAssistantAgent:
             await self._planner.close()
         if self._embedding:
             await self._embedding.close()
+        await http_utils.close_shared_client()
         
         logger.info("Agent已关闭")
     
@@ -218,25 +220,32 @@ class ElderlyAssistantAgent:
         if not self._planner or not self._vision:
             return
         
-        # 截取当前屏幕
-        screenshot = await self._vision.capture_screen()
-        screen_analysis = await self._vision.analyze_screen(
-            screenshot,
-            intent.normalized_text or intent.raw_text,
-        )
+        # 规划所需的知识检索与截屏、屏幕分析并发进行
+        self._planner.prefetch_knowledge(intent)
         
-        # 检查屏幕安全
-        if self._config.safety_check_enabled and self._safety:
-            screen_safety = self._safety.check_screen_content(
-                screen_analysis.description,
-                [e.text for e in screen_analysis.elements],
+        try:
+            # 截取当前屏幕
+            screenshot = await self._vision.capture_screen()
+            screen_analysis = await self._vision.analyze_screen(
+                screenshot,
+                intent.normalized_text or intent.raw_text,
             )
-            if screen_safety.warnings:
-                await self._speak(self._safety.generate_safety_warning(screen_safety))
         
-        # 创建计划
-        self._set_state(AgentState.PLANNING)
-        plan = await self._planner.create_plan(intent, screen_analysis)
+            # 检查屏幕安全
+            if self._config.safety_check_enabled and self._safety:
+                screen_safety = self._safety.check_screen_content(
+                    screen_analysis.description,
+                    [e.text for e in screen_analysis.elements],
+                )
+                if screen_safety.warnings:
+                    await self._speak(self._safety.generate_safety_warning(screen_safety))
+        
+            # 创建计划
+            self._set_state(AgentState.PLANNING)
+            plan = await self._planner.create_plan(intent, screen_analysis)
+        finally:
+            # 截屏或分析失败提前退出时，取消未被取用的知识预取
+            self._planner.cancel_prefetch()
         
         if not plan.steps:
             await self._speak("抱歉，我不太确定该怎么帮您完成这个操作。您能再说详细一点吗？")
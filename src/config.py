@@ -43,6 +43,16 @@ class APIConfig:
         "VL_MODEL", "Qwen3-VL-235B-A22B-Instruct"
     ))
     
+    # 规划LLM最大并发请求数（避免突发重试触发服务端限流）
+    llm_max_concurrency: int = field(default_factory=lambda: int(os.getenv(
+        "LLM_MAX_CONCURRENCY", "4"
+    )))
+    
+    # 规划请求体是否 gzip 压缩（需服务端支持 Content-Encoding: gzip）
+    llm_gzip_requests: bool = field(default_factory=lambda: os.getenv(
+        "LLM_GZIP_REQUESTS", "false"
+    ).lower() in ("1", "true", "yes"))
+    
     # 统一 API Key
     api_key: str = field(default_factory=lambda: os.getenv(
         "SOPHNET_API_KEY",
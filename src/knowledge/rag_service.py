@@ -34,6 +34,12 @@ class RAGService:
         # 缓存
         self._guide_embeddings: dict[UUID, list[float]] = {}
         self._node_embeddings: dict[UUID, list[float]] = {}
+        self._index_version = 0
+    
+    @property
+    def index_version(self) -> int:
+        """索引版本号，每次新增指南/节点时递增，调用方据此判断检索缓存是否失效"""
+        return self._index_version
     
     async def initialize(
         self,
@@ -77,6 +83,7 @@ class RAGService:
         
         # 添加到知识图谱
         self._knowledge_graph.add_guide(guide)
+        self._index_version += 1
         
         logger.debug(f"已索引指南: {guide.title}")
     
@@ -94,6 +101,7 @@ class RAGService:
         
         # 添加到知识图谱
         self._knowledge_graph.add_node(node)
+        self._index_version += 1
         
         logger.debug(f"已索引节点: {node.name}")
     
@@ -110,6 +118,51 @@ class RAGService:
         # 获取查询嵌入
         query_embedding = await self._embedding_service.embed_text(query)
         
+        return await self._retrieve_by_embedding(query_embedding, top_k, min_score)
+    
+    async def retrieve_batch(
+        self,
+        queries: list[str],
+        top_k: int = 5,
+        min_score: float = 0.5,
+    ) -> list[RAGResult]:
+        """批量检索：所有查询的嵌入通过一次请求获取"""
+        if not self._embedding_service or not self._knowledge_graph:
+            return [RAGResult() for _ in queries]
+        
+        # 相同查询只嵌入一次
+        unique_queries = list(dict.fromkeys(queries))
+        embeddings = await self._embedding_service.embed_texts(unique_queries)
+        embedding_map = dict(zip(unique_queries, embeddings, strict=True))
+        
+        results = []
+        for query in queries:
+            query_embedding = embedding_map.get(query)
+            if query_embedding is None:
+                results.append(RAGResult())
+                continue
+            results.append(await self._retrieve_by_embedding(query_embedding, top_k, min_score))
+        return results
+    
+    async def embed_texts(self, texts: list[str]) -> list[list[float]]:
+        """批量计算文本嵌入（供规划缓存等复用同一嵌入模型）"""
+        if not self._embedding_service or not texts:
+            return []
+        return await self._embedding_service.embed_texts(texts)
+    
+    def similarity(self, embedding1: list[float], embedding2: list[float]) -> float:
+        """计算两个嵌入向量的余弦相似度"""
+        if not self._embedding_service:
+            return 0.0
+        return self._embedding_service.cosine_similarity(embedding1, embedding2)
+    
+    async def _retrieve_by_embedding(
+        self,
+        query_embedding: list[float],
+        top_k: int,
+        min_score: float,
+    ) -> RAGResult:
+        """根据已计算的查询嵌入检索"""
         # 检索指南
         guides = await self._retrieve_guides(query_embedding, top_k, min_score)
         
@@ -279,9 +332,10 @@ class RAGService:
         all_guides: dict[UUID, tuple[float, OperationGuide]] = {}
         all_nodes: dict[UUID, tuple[float, KnowledgeNode]] = {}
         
-        for exp_query in expanded_queries:
-            result = await self.retrieve(exp_query, top_k, min_score)
-            
+        # 扩展查询的嵌入一次性批量获取
+        results = await self.retrieve_batch(expanded_queries, top_k, min_score)
+        
+        for result in results:
             for guide in result.guides:
                 if guide.id not in all_guides:
                     all_guides[guide.id] = (result.confidence, guide)
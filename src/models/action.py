@@ -5,7 +5,7 @@ from __future__ import annotations
 from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
-from typing import Optional
+from typing import Callable, Optional
 from uuid import UUID, uuid4
 
 
@@ -113,48 +113,50 @@ class Action:
     
     def to_friendly_description(self) -> str:
         """生成老年人友好的操作描述"""
-        descriptions = {
-            ActionType.CLICK: f"单击{{{self.element_description}}}",
-            ActionType.DOUBLE_CLICK: f"双击{{{self.element_description}}}",
-            ActionType.RIGHT_CLICK: f"右键单击{{{self.element_description}}}",
-            ActionType.DRAG: f"拖动{{{self.element_description}}}",
-            ActionType.TYPE: f"输入{{{self.text}}}",
-            ActionType.KEY_PRESS: f"按下{{{self.key}}}",
-            ActionType.HOTKEY: f"组合键{{{self.hotkey}}}",
-            ActionType.SCROLL: f"向{self._scroll_direction_cn()}滚动",
-            ActionType.WAIT: f"等待{{{self.wait_ms // 1000}秒}}",
-            ActionType.WAIT_ELEMENT: f"等待{{{self.element_description}}}出现",
-            ActionType.DONE: "完成",
-            ActionType.BACK: "返回上一步",
-        }
-        return descriptions.get(self.action_type, "执行操作")
+        builder = _FRIENDLY_DESCRIPTION_BUILDERS.get(self.action_type)
+        return builder(self) if builder else "执行操作"
     
     def to_skill_instruction(self) -> str:
         """转换为标准化技能指令格式"""
-        if self.action_type == ActionType.CLICK:
-            return f"单击{{{self.element_description}}}"
-        elif self.action_type == ActionType.DOUBLE_CLICK:
-            return f"双击{{{self.element_description}}}"
-        elif self.action_type == ActionType.RIGHT_CLICK:
-            return f"右键单击{{{self.element_description}}}"
-        elif self.action_type == ActionType.DRAG:
-            return f"拖动{{{self.element_description}}}至{{{self.target_x}, {self.target_y}}}"
-        elif self.action_type == ActionType.SCROLL:
-            direction = "向上" if self.scroll_direction == "up" else "向下"
-            return f"{direction}滚动{{{self.element_description or '当前区域'}}}"
-        elif self.action_type == ActionType.TYPE:
-            return f"输入{{{self.text}}}"
-        elif self.action_type == ActionType.KEY_PRESS:
-            return f"按下{{{self.key}}}"
-        elif self.action_type == ActionType.HOTKEY:
-            return f"组合键{{{self.hotkey}}}"
-        elif self.action_type == ActionType.WAIT:
-            return f"等待{{{self.wait_ms // 1000}秒}}"
-        elif self.action_type == ActionType.WAIT_ELEMENT:
-            return f"等待{{{self.element_description}}}出现"
-        return "未知操作"
+        builder = _SKILL_INSTRUCTION_BUILDERS.get(self.action_type)
+        return builder(self) if builder else "未知操作"
     
     def _scroll_direction_cn(self) -> str:
         """滚动方向中文"""
-        mapping = {"up": "上", "down": "下", "left": "左", "right": "右"}
-        return mapping.get(self.scroll_direction or "down", "下")
+        return _SCROLL_DIRECTION_CN.get(self.scroll_direction or "down", "下")
+
+
+# 滚动方向 -> 中文
+_SCROLL_DIRECTION_CN = {"up": "上", "down": "下", "left": "左", "right": "右"}
+
+# 动作类型 -> 老年人友好描述（按需生成，不再每次构造全部描述）
+_FRIENDLY_DESCRIPTION_BUILDERS: dict[ActionType, Callable[[Action], str]] = {
+    ActionType.CLICK: lambda a: f"单击{{{a.element_description}}}",
+    ActionType.DOUBLE_CLICK: lambda a: f"双击{{{a.element_description}}}",
+    ActionType.RIGHT_CLICK: lambda a: f"右键单击{{{a.element_description}}}",
+    ActionType.DRAG: lambda a: f"拖动{{{a.element_description}}}",
+    ActionType.TYPE: lambda a: f"输入{{{a.text}}}",
+    ActionType.KEY_PRESS: lambda a: f"按下{{{a.key}}}",
+    ActionType.HOTKEY: lambda a: f"组合键{{{a.hotkey}}}",
+    ActionType.SCROLL: lambda a: f"向{a._scroll_direction_cn()}滚动",
+    ActionType.WAIT: lambda a: f"等待{{{a.wait_ms // 1000}秒}}",
+    ActionType.WAIT_ELEMENT: lambda a: f"等待{{{a.element_description}}}出现",
+    ActionType.DONE: lambda a: "完成",
+    ActionType.BACK: lambda a: "返回上一步",
+}
+
+# 动作类型 -> 标准化技能指令
+_SKILL_INSTRUCTION_BUILDERS: dict[ActionType, Callable[[Action], str]] = {
+    ActionType.CLICK: lambda a: f"单击{{{a.element_description}}}",
+    ActionType.DOUBLE_CLICK: lambda a: f"双击{{{a.element_description}}}",
+    ActionType.RIGHT_CLICK: lambda a: f"右键单击{{{a.element_description}}}",
+    ActionType.DRAG: lambda a: f"拖动{{{a.element_description}}}至{{{a.target_x}, {a.target_y}}}",
+    ActionType.SCROLL: lambda a: (
+        f"{'向上' if a.scroll_direction == 'up' else '向下'}滚动{{{a.element_description or '当前区域'}}}"
+    ),
+    ActionType.TYPE: lambda a: f"输入{{{a.text}}}",
+    ActionType.KEY_PRESS: lambda a: f"按下{{{a.key}}}",
+    ActionType.HOTKEY: lambda a: f"组合键{{{a.hotkey}}}",
+    ActionType.WAIT: lambda a: f"等待{{{a.wait_ms // 1000}秒}}",
+    ActionType.WAIT_ELEMENT: lambda a: f"等待{{{a.element_description}}}出现",
+}
@@ -17,11 +17,16 @@ from ..config import config
 from ..models.intent import Intent
 from ..models.action import Action, ActionType, ActionStatus
 from ..models.task import Task, TaskStep, TaskPlan, TaskStatus
-from .vision_service import VisionService, ScreenAnalysis, ScreenStateAnalysis, VLConfig, PageStatus
+from .vision_service import VisionService, ScreenAnalysis, ScreenStateAnalysis, VLConfig, PageStatus, image_data_url
 from ..agent.executor import ActionExecutor
 from .planner_service import PlannerService
 
 
+# 页面描述中表示加载中/出错的关键词（匹配小写的描述）
+_LOADING_KEYWORDS = ("加载", "loading", "请稍候", "正在", "处理中")
+_ERROR_KEYWORDS = ("错误", "失败", "error", "failed", "无法连接")
+
+
 class StepStatus(str, Enum):
     """步骤执行状态"""
     PENDING = "pending"              # 等待执行
@@ -257,7 +262,7 @@ class ExecutorService:
         logger.info("ExecutorService初始化完成")
     
     async def close(self):
-        """关闭服务"""
+        """关闭服务（共享客户端由应用退出时统一关闭，外部传入的服务可能仍在使用）"""
         if self._input_listener:
             self._input_listener.stop()
         # 只关闭内部创建的服务
@@ -655,9 +660,6 @@ class ExecutorService:
             return False, ""
         
         try:
-            import base64
-            image_b64 = base64.b64encode(screenshot).decode("utf-8")
-            
             prompt = f"""判断用户的任务目标是否已经达成。
 
 任务目标：{self._context.task_goal}
@@ -686,7 +688,7 @@ class ExecutorService:
             messages = [{
                 "role": "user",
                 "content": [
-                    {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{image_b64}"}},
+                    {"type": "image_url", "image_url": {"url": image_data_url(screenshot)}},
                     {"type": "text", "text": prompt}
                 ]
             }]
@@ -720,10 +722,6 @@ class ExecutorService:
         返回: True 表示是动态效果，False 表示是用户操作导致的变化
         """
         try:
-            import base64
-            before_b64 = base64.b64encode(before_screenshot).decode("utf-8")
-            after_b64 = base64.b64encode(after_screenshot).decode("utf-8")
-            
             prompt = """比较这两张截图，判断页面变化的原因。
 
 请分析：
@@ -742,8 +740,8 @@ class ExecutorService:
             messages = [{
                 "role": "user",
                 "content": [
-                    {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{before_b64}"}},
-                    {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{after_b64}"}},
+                    {"type": "image_url", "image_url": {"url": image_data_url(before_screenshot)}},
+                    {"type": "image_url", "image_url": {"url": image_data_url(after_screenshot)}},
                     {"type": "text", "text": prompt}
                 ]
             }]
@@ -791,15 +789,11 @@ class ExecutorService:
         # 检查描述中的关键词
         description = (state.description or "").lower()
         
-        loading_keywords = ["加载", "loading", "请稍候", "正在", "处理中"]
-        for keyword in loading_keywords:
-            if keyword in description:
-                return ScreenState.LOADING
+        if any(keyword in description for keyword in _LOADING_KEYWORDS):
+            return ScreenState.LOADING
         
-        error_keywords = ["错误", "失败", "error", "failed", "无法连接"]
-        for keyword in error_keywords:
-            if keyword in description:
-                return ScreenState.ERROR
+        if any(keyword in description for keyword in _ERROR_KEYWORDS):
+            return ScreenState.ERROR
         
         # 比较与上次状态的差异
         if self._context.last_screen_state:
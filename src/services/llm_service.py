@@ -16,6 +16,13 @@ from ..models.intent import Intent, IntentType, Confidence
 from ..models.session import UserProfile
 
 
+# 应用分类关键词（匹配小写的应用名）
+_OFFICE_KEYWORDS = ("word", "excel", "powerpoint", "wps", "office")
+_BROWSER_KEYWORDS = ("chrome", "edge", "firefox", "浏览器", "browser", "360")
+_CHAT_KEYWORDS = ("微信", "wechat", "qq", "钉钉", "teams")
+_MAIL_KEYWORDS = ("outlook", "mail", "邮件", "邮箱", "foxmail")
+
+
 @dataclass
 class LLMConfig:
     """LLM配置"""
@@ -493,13 +500,13 @@ class LLMService:
         
         for app in self._installed_apps:
             app_lower = app.lower()
-            if any(kw in app_lower for kw in ['word', 'excel', 'powerpoint', 'wps', 'office']):
+            if any(kw in app_lower for kw in _OFFICE_KEYWORDS):
                 categories["办公软件"].append(app)
-            elif any(kw in app_lower for kw in ['chrome', 'edge', 'firefox', '浏览器', 'browser', '360']):
+            elif any(kw in app_lower for kw in _BROWSER_KEYWORDS):
                 categories["浏览器"].append(app)
-            elif any(kw in app_lower for kw in ['微信', 'wechat', 'qq', '钉钉', 'teams']):
+            elif any(kw in app_lower for kw in _CHAT_KEYWORDS):
                 categories["通讯软件"].append(app)
-            elif any(kw in app_lower for kw in ['outlook', 'mail', '邮件', '邮箱', 'foxmail']):
+            elif any(kw in app_lower for kw in _MAIL_KEYWORDS):
                 categories["邮件客户端"].append(app)
         
         parts = []
@@ -2,7 +2,13 @@
 
 from __future__ import annotations
 
+import asyncio
+import gzip
 import json
+import random
+import re
+import sys
+from collections import OrderedDict
 from typing import Optional, TYPE_CHECKING
 
 import httpx
@@ -10,157 +16,121 @@ from loguru import logger
 
 from ..config import config
 from ..models.intent import Intent
-from ..models.action import Action, ActionType
-from ..models.task import TaskStep, TaskPlan
+from ..models.action import Action, ActionType, ActionStatus
+from ..models.task import Task, TaskStep, TaskPlan
 from ..models.knowledge import KnowledgeGraph
+from ..utils import http_utils, json_utils
 from .vision_service import ScreenAnalysis
 
 if TYPE_CHECKING:
     from ..knowledge.rag_service import RAGService
 
 
-class PlannerService:
-    """任务规划服务"""
-    
-    def __init__(self) -> None:
-        self._base_url = config.api.sophnet_base_url
-        self._api_key = config.api.api_key
-        self._model = config.api.llm_model
-        self._client: Optional[httpx.AsyncClient] = None
-        self._knowledge_graph: Optional[KnowledgeGraph] = None
-        self._rag_service: Optional["RAGService"] = None
-    
-    async def initialize(self) -> None:
-        """初始化服务"""
-        self._client = httpx.AsyncClient(timeout=120.0)
-        self._knowledge_graph = KnowledgeGraph()
-        logger.info("Planner服务初始化完成")
-        logger.info(f"  - API URL: {self._base_url}/chat/completions")
-        logger.info(f"  - 模型: {self._model}")
-    
-    async def close(self) -> None:
-        """关闭服务"""
-        if self._client:
-            await self._client.aclose()
-            self._client = None
-    
-    def set_knowledge_graph(self, kg: KnowledgeGraph) -> None:
-        """设置知识图谱（兼容旧接口）"""
-        self._knowledge_graph = kg
-    
-    def set_rag_service(self, rag_service: "RAGService") -> None:
-        """设置RAG服务（推荐使用）"""
-        self._rag_service = rag_service
-        logger.info("Planner已关联RAG服务")
-    
-    async def _call_llm(self, system_prompt: str, user_prompt: str, max_tokens: int = 2000) -> str:
-        """调用LLM API
-        
-        Args:
-            system_prompt: 系统提示
-            user_prompt: 用户提示
-            max_tokens: 最大token数
-        """
-        if not self._client:
-            raise RuntimeError("Planner服务未初始化")
-        
-        try:
-            logger.debug(f"调用LLM API: {self._base_url}/chat/completions, 模型: {self._model}")
-            
-            response = await self._client.post(
-                f"{self._base_url}/chat/completions",
-                json={
-                    "model": self._model,
-                    "messages": [
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt},
-                    ],
-                    "max_tokens": max_tokens,
-                    "temperature": 0.3,
-                },
-                headers={
-                    "Authorization": f"Bearer {self._api_key}",
-                    "Content-Type": "application/json",
-                },
-            )
-            response.raise_for_status()
-            
-            result = response.json()
-            logger.debug(f"LLM API响应结构: {list(result.keys())}")
-            
-            # 兼容不同的响应格式
-            if "choices" in result and len(result["choices"]) > 0:
-                choice = result["choices"][0]
-                if "message" in choice:
-                    msg = choice["message"]
-                    # Qwen3 模型可能返回 reasoning_content 或 content
-                    if "content" in msg and msg["content"]:
-                        content = msg["content"]
-                    elif "reasoning_content" in msg and msg["reasoning_content"]:
-                        # Qwen3 的推理内容，需要从中提取有用信息
-                        content = msg["reasoning_content"]
-                    else:
-                        logger.warning(f"message中无content: {msg.keys()}")
-                        content = str(msg)
-                elif "text" in choice:
-                    content = choice["text"]
-                else:
-                    logger.error(f"未知的choice格式: {list(choice.keys())}")
-                    content = str(choice)
-            elif "content" in result:
-                content = result["content"]
-            elif "text" in result:
-                content = result["text"]
-            else:
-                logger.error(f"未知的响应格式: {result}")
-                content = str(result)
-            
-            logger.debug(f"LLM响应长度: {len(content)}")
-            return content
-            
-        except httpx.HTTPStatusError as e:
-            logger.error(f"LLM API HTTP错误: {e.response.status_code}")
-            logger.error(f"响应内容: {e.response.text}")
-            raise
-        except httpx.HTTPError as e:
-            logger.error(f"LLM API调用失败: {type(e).__name__}: {e}")
-            raise
-        except Exception as e:
-            logger.error(f"LLM API解析失败: {type(e).__name__}: {e}")
-            raise
-    
-    async def create_plan(
-        self,
-        intent: Intent,
-        screen_analysis: Optional[ScreenAnalysis] = None,
-    ) -> TaskPlan:
-        """创建任务计划"""
-        # 获取相关知识
-        knowledge_context = await self._get_relevant_knowledge(intent)
-        
-        # 构建规划提示
-        prompt = self._build_planning_prompt(
-            intent=intent,
-            screen_analysis=screen_analysis,
-            knowledge_context=knowledge_context,
-        )
-        
-        try:
-            content = await self._call_llm(
-                system_prompt=self._get_system_prompt(),
-                user_prompt=prompt,
-                max_tokens=2000,
-            )
-            return self._parse_plan(content, intent)
-            
-        except Exception as e:
-            logger.error(f"创建计划失败: {e}")
-            return TaskPlan(intent=intent)
-        
-        
-    def _get_system_prompt(self) -> str:
-        """获取系统提示（使用标准化 Skill Set）"""
-        return """你是一个帮助老年人操作电脑的AI规划器。
+# 技能类型 -> 动作类型（键经 sys.intern 驻留，解析结果驻留后查找可走指针比较）
+_SKILL_TO_ACTION: dict[str, ActionType] = {sys.intern(k): v for k, v in {
+    "单击": ActionType.CLICK,
+    "双击": ActionType.DOUBLE_CLICK,
+    "右键单击": ActionType.RIGHT_CLICK,
+    "拖动": ActionType.DRAG,
+    "向上滚动": ActionType.SCROLL,
+    "向下滚动": ActionType.SCROLL,
+    "输入": ActionType.TYPE,
+    "按下": ActionType.KEY_PRESS,
+    "组合键": ActionType.HOTKEY,
+    "等待": ActionType.WAIT,
+    "等待出现": ActionType.WAIT_ELEMENT,
+    "完成": ActionType.DONE,
+}.items()}
+
+# 合法的 skill_type 列表
+_VALID_SKILL_TYPES: frozenset[str] = frozenset(_SKILL_TO_ACTION)
+
+# 常见的错误 skill_type 映射（键为小写）
+_SKILL_TYPE_FIXES: dict[str, str] = {
+    "点击": "单击",
+    "左键点击": "单击",
+    "左键单击": "单击",
+    "鼠标点击": "单击",
+    "click": "单击",
+    "双击打开": "双击",
+    "double_click": "双击",
+    "右键点击": "右键单击",
+    "右击": "右键单击",
+    "right_click": "右键单击",
+    "拖拽": "拖动",
+    "drag": "拖动",
+    "滚动": "向下滚动",
+    "scroll": "向下滚动",
+    "向上滑动": "向上滚动",
+    "向下滑动": "向下滚动",
+    "键入": "输入",
+    "打字": "输入",
+    "type": "输入",
+    "按键": "按下",
+    "press": "按下",
+    "快捷键": "组合键",
+    "hotkey": "组合键",
+    "等一下": "等待",
+    "wait": "等待",
+    "done": "完成",
+    "结束": "完成",
+    "任务完成": "完成",
+}
+
+# 部分匹配：所有错误写法合成一个正则（长键优先），一次扫描找到最靠前且最具体的写法
+_SKILL_TYPE_FIX_RE = re.compile(
+    "|".join(re.escape(k) for k in sorted(_SKILL_TYPE_FIXES, key=len, reverse=True))
+)
+
+# 文本计划中的步骤行：以数字、"-" 或 "•" 开头，捕获去掉编号符号后的文本
+_STEP_LINE_RE = re.compile(r"[\d\-•][\d.\-•) ]*(.*)")
+
+# 规划响应的最大token数：常见计划为 3-6 步、每步约 100-150 token，留出余量避免截断JSON
+_PLAN_MAX_TOKENS = 1200
+
+# 重规划提示中保留的最近执行步骤数（更早的步骤对调整计划帮助不大，只会拉长提示）
+_REPLAN_HISTORY_STEPS = 3
+
+# 限流/网关错误时自动重试：最大重试次数、可重试状态码、单次等待上限（秒）
+_LLM_MAX_RETRIES = 3
+_RETRYABLE_STATUS_CODES = frozenset({429, 502, 503, 504})
+_MAX_RETRY_DELAY = 30.0
+
+# 知识检索缓存容量（按 查询文本 + 索引版本 缓存RAG上下文）
+_KNOWLEDGE_CACHE_SIZE = 64
+
+# 请求体超过该字节数时才压缩（小请求压缩收益抵不过开销）
+_GZIP_MIN_BYTES = 2048
+
+# 计划缓存容量（按 意图 + 屏幕指纹 缓存LLM原始响应）
+_PLAN_CACHE_SIZE = 64
+
+# 语义缓存阈值：意图文本不同但嵌入相似度达到该值时视为同一请求（如"打开微信"与"帮我打开微信"）
+_SEMANTIC_CACHE_THRESHOLD = 0.95
+
+# 规划提示中的固定片段
+_BANNER = "═══════════════════════════════════════"
+
+_HISTORY_HEADER = f"\n{_BANNER}\n【已执行的历史与结果】(请根据此调整计划)\n{_BANNER}"
+
+_HISTORY_FOOTER = "⚠️ 注意：之前的步骤可能失败了，请分析原因并尝试不同的路径。"
+
+_SCREEN_HEADER = f"\n{_BANNER}\n【当前屏幕状态 - 请仔细阅读】\n{_BANNER}"
+
+_DESKTOP_WARNING = (
+    "\n⚠️ 重要：用户当前在Windows桌面上！\n"
+    "   - 不要让用户点击浏览器的返回按钮（桌面上没有浏览器）\n"
+    "   - 不要让用户关闭窗口（桌面上可能没有打开的窗口）\n"
+    "   - 如果用户想打开应用，应该从开始菜单或桌面图标开始"
+)
+
+_PROMPT_FOOTER = (
+    "\n请根据【当前屏幕状态】一次性生成完整的操作步骤计划。\n"
+    "如果任务已经完成或当前屏幕已经是目标状态，请返回 skill_type='完成' 的步骤。"
+)
+
+# 规划系统提示（使用标准化 Skill Set）；内容固定，模块加载时构建一次
+_SYSTEM_PROMPT = """你是一个帮助老年人操作电脑的AI规划器。
 
 你的任务是将用户的意图分解为简单、清晰的操作步骤。
 
@@ -361,6 +331,401 @@ class PlannerService:
         }
     ]
 }"""
+
+
+class PlannerService:
+    """任务规划服务"""
+    
+    def __init__(self) -> None:
+        self._base_url = config.api.sophnet_base_url
+        self._api_key = config.api.api_key
+        self._model = config.api.llm_model
+        self._client: Optional[httpx.AsyncClient] = None
+        self._knowledge_graph: Optional[KnowledgeGraph] = None
+        self._rag_service: Optional["RAGService"] = None
+        self._plan_cache: OrderedDict[tuple, str] = OrderedDict()
+        # 最近一次 create_plan 返回的计划对应的缓存键，计划执行失败时据此移出缓存
+        self._last_plan_key: Optional[tuple] = None
+        self._intent_embeddings: OrderedDict[str, list[float]] = OrderedDict()
+        self._knowledge_tasks: dict[tuple, asyncio.Task] = {}
+        self._knowledge_cache: OrderedDict[tuple, str] = OrderedDict()
+        self._llm_semaphore = asyncio.Semaphore(config.api.llm_max_concurrency)
+        self._inflight_llm: dict[tuple, asyncio.Future] = {}
+        self._json_mode_supported = True
+        self._gzip_requests = config.api.llm_gzip_requests
+    
+    async def initialize(self) -> None:
+        """初始化服务"""
+        self._client = http_utils.get_shared_client()
+        self._knowledge_graph = KnowledgeGraph()
+        logger.info("Planner服务初始化完成")
+        logger.info(f"  - API URL: {self._base_url}/chat/completions")
+        logger.info(f"  - 模型: {self._model}")
+    
+    async def close(self) -> None:
+        """关闭服务（共享客户端由应用退出时统一关闭）"""
+        self.cancel_prefetch()
+        self._client = None
+    
+    def set_knowledge_graph(self, kg: KnowledgeGraph) -> None:
+        """设置知识图谱（兼容旧接口）"""
+        self._knowledge_graph = kg
+    
+    def set_rag_service(self, rag_service: "RAGService") -> None:
+        """设置RAG服务（推荐使用）"""
+        self._rag_service = rag_service
+        logger.info("Planner已关联RAG服务")
+    
+    async def _call_llm(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        max_tokens: int = _PLAN_MAX_TOKENS,
+        json_mode: bool = False,
+    ) -> str:
+        """调用LLM API（相同请求进行中时合并为一次调用）
+        
+        Args:
+            system_prompt: 系统提示
+            user_prompt: 用户提示
+            max_tokens: 最大token数
+            json_mode: 是否要求服务端以JSON对象输出（不支持时自动回退）
+        """
+        key = (system_prompt, user_prompt, max_tokens, json_mode)
+        inflight = self._inflight_llm.get(key)
+        if inflight is not None:
+            logger.debug("相同的LLM请求正在进行，等待其结果")
+            return await asyncio.shield(inflight)
+        
+        future = asyncio.ensure_future(
+            self._post_chat(system_prompt, user_prompt, max_tokens, json_mode)
+        )
+        self._inflight_llm[key] = future
+        try:
+            # shield：某个调用方被取消时不影响其他等待同一结果的调用方
+            return await asyncio.shield(future)
+        finally:
+            if self._inflight_llm.get(key) is future:
+                del self._inflight_llm[key]
+    
+    async def _post_chat(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        max_tokens: int,
+        json_mode: bool,
+    ) -> str:
+        """发送一次 chat/completions 请求并提取文本内容"""
+        if not self._client:
+            raise RuntimeError("Planner服务未初始化")
+        
+        payload = {
+            "model": self._model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            "max_tokens": max_tokens,
+            "temperature": 0.3,
+        }
+        use_json_mode = json_mode and self._json_mode_supported
+        if use_json_mode:
+            payload["response_format"] = {"type": "json_object"}
+        
+        try:
+            logger.debug("调用LLM API: {}/chat/completions, 模型: {}", self._base_url, self._model)
+            
+            body = json_utils.dumps(payload)
+            headers = {
+                "Authorization": f"Bearer {self._api_key}",
+                "Content-Type": "application/json",
+            }
+            # 系统提示 + 屏幕描述约 7-10 KB，重复的中文标点和分隔线压缩率很高
+            if self._gzip_requests and len(body) > _GZIP_MIN_BYTES:
+                body = gzip.compress(body, compresslevel=1)
+                headers["Content-Encoding"] = "gzip"
+            
+            for attempt in range(_LLM_MAX_RETRIES + 1):
+                async with self._llm_semaphore:
+                    response = await self._client.post(
+                        f"{self._base_url}/chat/completions",
+                        content=body,
+                        headers=headers,
+                    )
+                if response.status_code not in _RETRYABLE_STATUS_CODES or attempt == _LLM_MAX_RETRIES:
+                    break
+                # 等待期间不占用并发名额
+                delay = self._retry_delay(response, attempt)
+                logger.warning(
+                    "LLM API返回 {}，{:.1f}秒后重试（第{}次）", response.status_code, delay, attempt + 1
+                )
+                await asyncio.sleep(delay)
+            response.raise_for_status()
+            logger.debug("LLM API协议: {}", response.http_version)
+            
+            result = response.json()
+            logger.opt(lazy=True).debug("LLM API响应结构: {}", lambda: list(result.keys()))
+            
+            # 兼容不同的响应格式
+            if "choices" in result and len(result["choices"]) > 0:
+                choice = result["choices"][0]
+                if "message" in choice:
+                    msg = choice["message"]
+                    # Qwen3 模型可能返回 reasoning_content 或 content
+                    if "content" in msg and msg["content"]:
+                        content = msg["content"]
+                    elif "reasoning_content" in msg and msg["reasoning_content"]:
+                        # Qwen3 的推理内容，需要从中提取有用信息
+                        content = msg["reasoning_content"]
+                    else:
+                        logger.warning(f"message中无content: {msg.keys()}")
+                        content = str(msg)
+                elif "text" in choice:
+                    content = choice["text"]
+                else:
+                    logger.error(f"未知的choice格式: {list(choice.keys())}")
+                    content = str(choice)
+            elif "content" in result:
+                content = result["content"]
+            elif "text" in result:
+                content = result["text"]
+            else:
+                logger.error(f"未知的响应格式: {result}")
+                content = str(result)
+            
+            logger.opt(lazy=True).debug("LLM响应长度: {}", lambda: len(content))
+            return content
+            
+        except httpx.HTTPStatusError as e:
+            if use_json_mode and self._rejects_json_mode(e.response):
+                logger.warning("LLM API不支持JSON输出模式，改用普通模式重试")
+                self._json_mode_supported = False
+                return await self._post_chat(system_prompt, user_prompt, max_tokens, json_mode=False)
+            logger.error(f"LLM API HTTP错误: {e.response.status_code}")
+            # 限流/网关错误的响应体没有诊断价值，不再整段输出
+            if e.response.status_code not in _RETRYABLE_STATUS_CODES:
+                logger.error(f"响应内容: {e.response.text}")
+            raise
+        except httpx.HTTPError as e:
+            logger.error(f"LLM API调用失败: {type(e).__name__}: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"LLM API解析失败: {type(e).__name__}: {e}")
+            raise
+    
+    @staticmethod
+    def _rejects_json_mode(response: httpx.Response) -> bool:
+        """判断 400 错误是否因为服务端不支持 response_format
+        
+        上下文超长等其他 400 错误不应关闭 JSON 模式。
+        """
+        if response.status_code != 400:
+            return False
+        text = response.text.lower()
+        return "response_format" in text or "json_object" in text
+    
+    @staticmethod
+    def _retry_delay(response: httpx.Response, attempt: int) -> float:
+        """重试等待时间：优先遵循 Retry-After，否则指数退避并加随机抖动"""
+        retry_after = response.headers.get("Retry-After")
+        if retry_after is not None:
+            try:
+                return min(max(float(retry_after), 0.0), _MAX_RETRY_DELAY)
+            except ValueError:
+                pass  # HTTP 日期格式，按指数退避处理
+        return min(2 ** attempt + random.random(), _MAX_RETRY_DELAY)
+    
+    async def create_plan(
+        self,
+        intent: Intent,
+        screen_analysis: Optional[ScreenAnalysis] = None,
+        use_cache: bool = True,
+    ) -> TaskPlan:
+        """创建任务计划
+        
+        Args:
+            intent: 用户意图
+            screen_analysis: 当前屏幕分析
+            use_cache: 是否使用计划缓存；上一个计划执行失败后重新规划时应传 False，
+                否则屏幕未变化时会再次拿到刚失败的计划
+        """
+        try:
+            cache_key = self._plan_cache_key(intent, screen_analysis)
+        except Exception as e:
+            logger.warning(f"无法生成计划缓存键，本次不使用缓存: {e}")
+            cache_key, use_cache = None, False
+        
+        if use_cache:
+            # 同一意图且屏幕状态未变化（如用户犹豫后重复请求）时直接复用上次的计划
+            hit_key = cache_key if cache_key in self._plan_cache else None
+            if hit_key is None:
+                hit_key = await self._find_similar_cached_plan(cache_key)
+            if hit_key is not None:
+                self._plan_cache.move_to_end(hit_key)
+                logger.debug("屏幕状态未变化，复用缓存的计划")
+                # 命中缓存时不再需要预取的知识
+                self.cancel_prefetch()
+                self._last_plan_key = hit_key
+                return self._parse_plan(self._plan_cache[hit_key], intent)
+        elif cache_key is not None:
+            # 丢弃刚执行失败的计划，重新规划的结果也不缓存
+            self._plan_cache.pop(cache_key, None)
+        self._last_plan_key = None
+        
+        # 获取相关知识
+        knowledge_context = await self._get_relevant_knowledge(intent)
+        
+        # 构建规划提示
+        prompt = self._build_planning_prompt(
+            intent=intent,
+            screen_analysis=screen_analysis,
+            knowledge_context=knowledge_context,
+        )
+        
+        return await self._request_plan(intent, prompt, cache_key=cache_key if use_cache else None)
+    
+    async def replan_on_error(
+        self,
+        task: Task,
+        error_description: str,
+        current_screen: Optional[ScreenAnalysis] = None,
+    ) -> TaskPlan:
+        """执行出错后根据已执行历史和当前屏幕重新规划"""
+        self.invalidate_last_plan()
+        intent = task.intent or (task.plan.intent if task.plan else None) or Intent()
+        
+        history: list[str] = []
+        if task.plan:
+            end = task.plan.current_step_index + 1
+            for step in task.plan.steps[max(0, end - _REPLAN_HISTORY_STEPS):end]:
+                result = "成功" if step.status == ActionStatus.SUCCESS else "未完成"
+                history.append(f"步骤{step.step_number} {step.description}：{result}")
+        history.append(f"出错原因：{error_description}")
+        
+        knowledge_context = await self._get_relevant_knowledge(intent)
+        
+        prompt = self._build_planning_prompt(
+            intent=intent,
+            screen_analysis=current_screen,
+            knowledge_context=knowledge_context,
+            history=history,
+        )
+        
+        return await self._request_plan(intent, prompt)
+    
+    def invalidate_last_plan(self) -> None:
+        """最近一次 create_plan 返回的计划执行失败，将其移出缓存
+        
+        否则用户在相同屏幕下重复同一请求时，会再次拿到这个失败的计划。
+        """
+        if self._last_plan_key is not None:
+            self._plan_cache.pop(self._last_plan_key, None)
+            self._last_plan_key = None
+    
+    @staticmethod
+    def _plan_cache_key(intent: Intent, screen_analysis: Optional[ScreenAnalysis]) -> tuple:
+        """计划缓存键：意图 + 屏幕指纹（仅包含规划提示中用到的字段）
+        
+        除首位的意图文本外，其余字段（意图类型、参数、目标状态等）都必须完全一致，
+        语义匹配只在这些字段相同的计划之间进行，避免"搜索北京天气"复用"搜索上海天气"的计划。
+        """
+        screen_fingerprint = None
+        if screen_analysis:
+            screen_fingerprint = (
+                screen_analysis.app_name,
+                screen_analysis.screen_type,
+                screen_analysis.description,
+                tuple(screen_analysis.suggested_actions),
+                tuple(screen_analysis.warnings),
+            )
+        return (
+            intent.normalized_text or intent.raw_text,
+            intent.intent_type,
+            intent.target_app,
+            intent.target_contact,
+            intent.target_state,
+            # 参数来自模型输出的 JSON，值可能是列表或字典，序列化为规范字符串后才能作为键
+            json.dumps(intent.parameters, ensure_ascii=False, sort_keys=True, default=str),
+            screen_fingerprint,
+        )
+    
+    async def _find_similar_cached_plan(self, cache_key: tuple) -> Optional[tuple]:
+        """语义查找缓存：屏幕指纹等其余字段相同、意图文本嵌入足够相似的缓存计划
+        
+        仅在存在候选时才计算嵌入，缓存为空或屏幕已变化时不产生额外请求。
+        """
+        if not self._rag_service or not cache_key[0]:
+            return None
+        
+        candidates = [key for key in self._plan_cache if key[1:] == cache_key[1:] and key[0]]
+        if not candidates:
+            return None
+        
+        texts = [cache_key[0]] + [key[0] for key in candidates]
+        missing = [text for text in dict.fromkeys(texts) if text not in self._intent_embeddings]
+        try:
+            if missing:
+                embeddings = await self._rag_service.embed_texts(missing)
+                for text, embedding in zip(missing, embeddings, strict=True):
+                    self._intent_embeddings[text] = embedding
+                    if len(self._intent_embeddings) > _PLAN_CACHE_SIZE:
+                        self._intent_embeddings.popitem(last=False)
+        except Exception as e:
+            logger.warning(f"计算意图嵌入失败，跳过语义缓存: {e}")
+            return None
+        
+        query_embedding = self._intent_embeddings.get(cache_key[0])
+        if query_embedding is None:
+            return None
+        
+        best_key, best_score = None, _SEMANTIC_CACHE_THRESHOLD
+        for key in candidates:
+            embedding = self._intent_embeddings.get(key[0])
+            if embedding is None:
+                continue
+            score = self._rag_service.similarity(query_embedding, embedding)
+            if score >= best_score:
+                best_key, best_score = key, score
+        
+        if best_key is not None:
+            logger.debug("语义命中缓存计划: {!r} ≈ {!r} ({:.3f})", cache_key[0], best_key[0], best_score)
+        return best_key
+    
+    async def _request_plan(
+        self,
+        intent: Intent,
+        user_prompt: str,
+        cache_key: Optional[tuple] = None,
+    ) -> TaskPlan:
+        """create_plan 与 replan_on_error 共用的规划调用
+        
+        两者发送完全相同的系统提示且位于消息首位，服务端可复用前缀缓存，
+        只有用户提示部分需要重新预填充。
+        """
+        try:
+            content = await self._call_llm(
+                system_prompt=self._get_system_prompt(),
+                user_prompt=user_prompt,
+                max_tokens=_PLAN_MAX_TOKENS,
+                json_mode=True,
+            )
+            plan = self._parse_plan(content, intent)
+            
+            # 缓存原始响应而非 TaskPlan，命中时重新解析得到全新的步骤对象
+            if cache_key is not None and plan.steps:
+                self._plan_cache[cache_key] = content
+                self._last_plan_key = cache_key
+                if len(self._plan_cache) > _PLAN_CACHE_SIZE:
+                    self._plan_cache.popitem(last=False)
+            return plan
+            
+        except Exception as e:
+            logger.error(f"创建计划失败: {e}")
+            return TaskPlan(intent=intent)
+    
+    def _get_system_prompt(self) -> str:
+        """获取系统提示（使用标准化 Skill Set）"""
+        return _SYSTEM_PROMPT
     
     def _build_planning_prompt(
         self,
@@ -380,29 +745,23 @@ class PlannerService:
         
         # --- 新增：插入历史记录，这对于重规划至关重要 ---
         if history:
-            parts.append(f"\n═══════════════════════════════════════")
-            parts.append(f"【已执行的历史与结果】(请根据此调整计划)")
-            parts.append(f"═══════════════════════════════════════")
-            for item in history:
-                parts.append(f"- {item}")
-            parts.append(f"⚠️ 注意：之前的步骤可能失败了，请分析原因并尝试不同的路径。")
+            parts.append(_HISTORY_HEADER)
+            parts.extend(f"- {item}" for item in history)
+            parts.append(_HISTORY_FOOTER)
         # -----------------------------------------------
 
         if screen_analysis:
-            parts.append(f"\n═══════════════════════════════════════")
-            parts.append(f"【当前屏幕状态 - 请仔细阅读】")
-            parts.append(f"═══════════════════════════════════════")
-            parts.append(f"屏幕描述：{screen_analysis.description}")
-            parts.append(f"当前应用：{screen_analysis.app_name}")
-            parts.append(f"页面类型：{screen_analysis.screen_type}")
+            parts.append(_SCREEN_HEADER)
+            parts.append(
+                f"屏幕描述：{screen_analysis.description}\n"
+                f"当前应用：{screen_analysis.app_name}\n"
+                f"页面类型：{screen_analysis.screen_type}"
+            )
             
             # 检测是否是桌面状态
             is_desktop = "桌面" in screen_analysis.app_name or "桌面" in screen_analysis.description
             if is_desktop:
-                parts.append(f"\n⚠️ 重要：用户当前在Windows桌面上！")
-                parts.append(f"   - 不要让用户点击浏览器的返回按钮（桌面上没有浏览器）")
-                parts.append(f"   - 不要让用户关闭窗口（桌面上可能没有打开的窗口）")
-                parts.append(f"   - 如果用户想打开应用，应该从开始菜单或桌面图标开始")
+                parts.append(_DESKTOP_WARNING)
             
             # 使用建议的操作
             if screen_analysis.suggested_actions:
@@ -412,22 +771,64 @@ class PlannerService:
             if screen_analysis.warnings:
                 parts.append(f"\n⚠️ 注意：{', '.join(screen_analysis.warnings)}")
             
-            parts.append(f"═══════════════════════════════════════")
+            parts.append(_BANNER)
         
         if knowledge_context:
             parts.append(f"\n参考知识：\n{knowledge_context}")
         
-        parts.append("\n请根据【当前屏幕状态】一次性生成完整的操作步骤计划。")
-        parts.append("如果任务已经完成或当前屏幕已经是目标状态，请返回 skill_type='完成' 的步骤。")
+        parts.append(_PROMPT_FOOTER)
         
         return "\n".join(parts)
     
+    def prefetch_knowledge(self, intent: Intent) -> None:
+        """提前发起知识检索，与屏幕分析等耗时操作并发进行，create_plan 时直接取用结果
+        
+        调用方在流程提前结束时应调用 cancel_prefetch，避免检索任务在后台空跑。
+        """
+        query = intent.normalized_text or intent.raw_text
+        if not query:
+            return
+        key = self._knowledge_key(query)
+        if key in self._knowledge_tasks:
+            return
+        
+        # 只保留最新意图的检索，之前未被取用的直接取消
+        self.cancel_prefetch()
+        self._knowledge_tasks[key] = asyncio.create_task(self._retrieve_knowledge(query))
+    
+    def cancel_prefetch(self) -> None:
+        """取消尚未被取用的知识预取任务"""
+        for task in self._knowledge_tasks.values():
+            task.cancel()
+        self._knowledge_tasks.clear()
+    
+    def _knowledge_key(self, query: str) -> tuple:
+        """知识检索的键：与检索缓存一致，索引更新后之前预取的结果不再取用"""
+        index_version = self._rag_service.index_version if self._rag_service else None
+        return (query, index_version)
+    
     async def _get_relevant_knowledge(self, intent: Intent) -> str:
-        """获取相关知识 - 优先使用RAG服务"""
+        """获取相关知识（优先取用 prefetch_knowledge 已发起的检索）"""
         query = intent.normalized_text or intent.raw_text
         
+        task = self._knowledge_tasks.pop(self._knowledge_key(query), None)
+        # 其余预取（其他意图或旧索引版本）已不会被取用
+        self.cancel_prefetch()
+        if task is not None:
+            return await task
+        return await self._retrieve_knowledge(query)
+    
+    async def _retrieve_knowledge(self, query: str) -> str:
+        """检索相关知识 - 优先使用RAG服务"""
         # 优先使用 RAG 服务（向量语义检索）
         if self._rag_service:
+            # 重复查询（重试、重规划、同一句话）直接复用；新增知识后索引版本变化，缓存自动失效
+            cache_key = (query, self._rag_service.index_version)
+            cached = self._knowledge_cache.get(cache_key)
+            if cached is not None:
+                self._knowledge_cache.move_to_end(cache_key)
+                return cached
+            
             try:
                 # 使用带查询扩展的检索（支持老年人语言映射）
                 rag_result = await self._rag_service.retrieve_with_expansion(
@@ -437,7 +838,10 @@ class PlannerService:
                 )
                 
                 if rag_result.context:
-                    logger.debug(f"RAG检索成功，置信度: {rag_result.confidence:.2f}")
+                    logger.debug("RAG检索成功，置信度: {:.2f}", rag_result.confidence)
+                    self._knowledge_cache[cache_key] = rag_result.context
+                    if len(self._knowledge_cache) > _KNOWLEDGE_CACHE_SIZE:
+                        self._knowledge_cache.popitem(last=False)
                     return rag_result.context
                     
             except Exception as e:
@@ -469,167 +873,135 @@ class PlannerService:
     
     def _parse_plan(self, content: str, intent: Intent) -> TaskPlan:
         """解析计划（支持标准化 Skill Set 格式，带严格验证）"""
-        import json
-        
         plan = TaskPlan(intent=intent)
         
-        # 合法的 skill_type 列表
-        VALID_SKILL_TYPES = {
-            "单击", "双击", "右键单击", "拖动",
-            "向上滚动", "向下滚动",
-            "输入", "按下", "组合键",
-            "等待", "等待出现",
-            "完成"
-        }
-        
         try:
-            # 提取JSON
-            start = content.find("{")
-            end = content.rfind("}") + 1
-            if start >= 0 and end > start:
-                data = json.loads(content[start:end])
-                
+            data = self._load_plan_json(content)
+            if data is not None:
                 invalid_steps = []  # 记录无效步骤
                 
                 for step_data in data.get("steps", []):
-                    # 解析技能类型
-                    skill_type_str = step_data.get("skill_type", "单击")
-                    original_skill_type = skill_type_str
-                    
-                    # 验证 skill_type 是否合法
-                    if skill_type_str not in VALID_SKILL_TYPES:
-                        logger.warning(f"非法的 skill_type: {skill_type_str}，尝试修正")
-                        skill_type_str = self._fix_invalid_skill_type(skill_type_str)
-                        if skill_type_str not in VALID_SKILL_TYPES:
-                            logger.error(f"无法修正的 skill_type: {original_skill_type}，跳过此步骤")
-                            invalid_steps.append(f"步骤{step_data.get('step_number', '?')}: {original_skill_type}")
-                            continue
-                    
-                    action_type = self._skill_type_to_action_type(skill_type_str)
-                    
-                    # 构建动作
-                    action = Action(
-                        action_type=action_type,
-                        element_description=step_data.get("target", ""),
-                        text=step_data.get("text"),
-                        key=step_data.get("key"),
-                        hotkey=step_data.get("hotkey"),
-                        visual_hint=step_data.get("visual_hint", ""),
-                    )
-                    
-                    # 设置滚动方向
-                    if skill_type_str == "向上滚动":
-                        action.scroll_direction = "up"
-                    elif skill_type_str == "向下滚动":
-                        action.scroll_direction = "down"
-                    
-                    # 设置等待时间
-                    if skill_type_str == "等待":
-                        wait_seconds = step_data.get("wait_seconds", 1)
-                        action.wait_ms = int(wait_seconds * 1000)
-                    
-                    # 构建步骤
-                    step = TaskStep(
-                        step_number=step_data.get("step_number", len(plan.steps) + 1),
-                        description=f"{skill_type_str}{{{step_data.get('target', '')}}}",
-                        friendly_instruction=step_data.get("friendly_description", ""),
-                        action=action,
-                        expected_result=step_data.get("expected_result", ""),
-                        error_recovery_hint=step_data.get("error_recovery", ""),
-                        visual_hint=step_data.get("visual_hint", ""),
-                    )
+                    step = self._parse_step(step_data, len(plan.steps) + 1)
+                    if step is None:
+                        invalid_steps.append(
+                            f"步骤{step_data.get('step_number', '?')}: {step_data.get('skill_type')}"
+                        )
+                        continue
                     plan.steps.append(step)
                 
                 # 如果有无效步骤，记录警告
                 if invalid_steps:
                     logger.warning(f"计划中有 {len(invalid_steps)} 个无效步骤被跳过: {invalid_steps}")
                     
-        except json.JSONDecodeError:
+        except json_utils.JSONDecodeError:
             logger.warning("无法解析计划JSON，尝试文本解析")
             plan = self._parse_plan_from_text(content, intent)
         
         return plan
     
+    @staticmethod
+    def _load_plan_json(content: str) -> Optional[dict]:
+        """提取并解析计划JSON，无JSON片段时返回 None"""
+        # JSON 输出模式下响应本身就是完整的JSON对象，直接解析，无需扫描首尾大括号
+        if content.startswith("{"):
+            try:
+                return json_utils.loads(content)
+            except json_utils.JSONDecodeError:
+                pass
+        
+        # 响应夹杂说明文字或代码块时，截取首尾大括号之间的内容
+        start = content.find("{")
+        end = content.rfind("}") + 1
+        if start >= 0 and end > start:
+            return json_utils.loads(content[start:end])
+        return None
+    
+    def _parse_step(self, step_data: dict, default_step_number: int) -> Optional[TaskStep]:
+        """解析单个步骤，skill_type 无法修正时返回 None"""
+        # 解析技能类型
+        skill_type_str = step_data.get("skill_type", "单击")
+        if isinstance(skill_type_str, str):
+            skill_type_str = sys.intern(skill_type_str)
+        original_skill_type = skill_type_str
+        
+        # 验证 skill_type 是否合法
+        if skill_type_str not in _VALID_SKILL_TYPES:
+            logger.warning(f"非法的 skill_type: {skill_type_str}，尝试修正")
+            skill_type_str = self._fix_invalid_skill_type(skill_type_str)
+            if skill_type_str not in _VALID_SKILL_TYPES:
+                logger.error(f"无法修正的 skill_type: {original_skill_type}，跳过此步骤")
+                return None
+        
+        action_type = self._skill_type_to_action_type(skill_type_str)
+        
+        # 构建动作
+        action = Action(
+            action_type=action_type,
+            element_description=step_data.get("target", ""),
+            text=step_data.get("text"),
+            key=step_data.get("key"),
+            hotkey=step_data.get("hotkey"),
+            visual_hint=step_data.get("visual_hint", ""),
+        )
+        
+        # 设置滚动方向
+        if skill_type_str == "向上滚动":
+            action.scroll_direction = "up"
+        elif skill_type_str == "向下滚动":
+            action.scroll_direction = "down"
+        
+        # 设置等待时间
+        if skill_type_str == "等待":
+            wait_seconds = step_data.get("wait_seconds", 1)
+            action.wait_ms = int(wait_seconds * 1000)
+        
+        # 构建步骤
+        return TaskStep(
+            step_number=step_data.get("step_number", default_step_number),
+            description=f"{skill_type_str}{{{step_data.get('target', '')}}}",
+            friendly_instruction=step_data.get("friendly_description", ""),
+            action=action,
+            expected_result=step_data.get("expected_result", ""),
+            error_recovery_hint=step_data.get("error_recovery", ""),
+            visual_hint=step_data.get("visual_hint", ""),
+        )
+    
     def _fix_invalid_skill_type(self, skill_type: str) -> str:
         """尝试修正非法的 skill_type"""
-        # 常见的错误映射
-        fix_mapping = {
-            "点击": "单击",
-            "左键点击": "单击",
-            "左键单击": "单击",
-            "鼠标点击": "单击",
-            "click": "单击",
-            "双击打开": "双击",
-            "double_click": "双击",
-            "右键点击": "右键单击",
-            "右击": "右键单击",
-            "right_click": "右键单击",
-            "拖拽": "拖动",
-            "drag": "拖动",
-            "滚动": "向下滚动",
-            "scroll": "向下滚动",
-            "向上滑动": "向上滚动",
-            "向下滑动": "向下滚动",
-            "键入": "输入",
-            "打字": "输入",
-            "type": "输入",
-            "按键": "按下",
-            "press": "按下",
-            "快捷键": "组合键",
-            "hotkey": "组合键",
-            "等一下": "等待",
-            "wait": "等待",
-            "done": "完成",
-            "结束": "完成",
-            "任务完成": "完成",
-        }
+        lowered = skill_type.lower()
         
         # 尝试直接映射
-        if skill_type.lower() in fix_mapping:
-            return fix_mapping[skill_type.lower()]
+        fixed = _SKILL_TYPE_FIXES.get(lowered)
+        if fixed is not None:
+            return fixed
         
         # 尝试部分匹配
-        for wrong, correct in fix_mapping.items():
-            if wrong in skill_type.lower():
-                return correct
+        match = _SKILL_TYPE_FIX_RE.search(lowered)
+        if match:
+            return _SKILL_TYPE_FIXES[match.group(0)]
         
         return skill_type
     
     def _skill_type_to_action_type(self, skill_type: str) -> ActionType:
         """将技能类型转换为动作类型"""
-        mapping = {
-            "单击": ActionType.CLICK,
-            "双击": ActionType.DOUBLE_CLICK,
-            "右键单击": ActionType.RIGHT_CLICK,
-            "拖动": ActionType.DRAG,
-            "向上滚动": ActionType.SCROLL,
-            "向下滚动": ActionType.SCROLL,
-            "输入": ActionType.TYPE,
-            "按下": ActionType.KEY_PRESS,
-            "组合键": ActionType.HOTKEY,
-            "等待": ActionType.WAIT,
-            "等待出现": ActionType.WAIT_ELEMENT,
-            "完成": ActionType.DONE,
-        }
-        return mapping.get(skill_type, ActionType.CLICK)
+        return _SKILL_TO_ACTION.get(skill_type, ActionType.CLICK)
     
     def _parse_plan_from_text(self, content: str, intent: Intent) -> TaskPlan:
         """从文本解析计划"""
         plan = TaskPlan(intent=intent)
         
-        lines = content.strip().split("\n")
         step_number = 0
         
-        for line in lines:
+        for line in content.splitlines():
             line = line.strip()
             if not line:
                 continue
             
-            # 检查是否是步骤行
-            if line[0].isdigit() or line.startswith("-") or line.startswith("•"):
+            # 检查是否是步骤行，并清理行首的数字和符号
+            match = _STEP_LINE_RE.match(line)
+            if match:
                 step_number += 1
-                # 清理行首的数字和符号
-                text = line.lstrip("0123456789.-•) ").strip()
+                text = match.group(1).strip()
                 
                 step = TaskStep(
                     step_number=step_number,
@@ -3,17 +3,143 @@
 from __future__ import annotations
 
 import asyncio
-import base64
-import json
-import tempfile
+import hashlib
+import importlib.util
+import io
 import os
+import stat
+import sys
+from collections import OrderedDict, deque
+from contextlib import aclosing
 from dataclasses import dataclass
-from typing import Optional
+from pathlib import Path
+from typing import AsyncIterator, Optional, Union
 
 import httpx
 from loguru import logger
 
+try:
+    import miniaudio
+except ImportError:  # miniaudio 为可选依赖，未安装时回退到其他播放方式
+    miniaudio = None
+
 from ..config import config
+from ..utils import http_utils, json_utils
+
+
+def _default_cache_dir() -> Path:
+    """当前用户自己的缓存目录（可用 TTS_CACHE_DIR 指定）
+    
+    不放在所有用户共享的临时目录：缓存文件名可由文本推算，他人可预先放入伪造的语音。
+    """
+    configured = os.getenv("TTS_CACHE_DIR")
+    if configured:
+        return Path(configured)
+    if sys.platform == "win32":
+        base = Path(os.getenv("LOCALAPPDATA") or Path.home() / "AppData" / "Local")
+    else:
+        base = Path(os.getenv("XDG_CACHE_HOME") or Path.home() / ".cache")
+    return base / "elder_helper" / "tts"
+
+
+# Windows 回退播放库只探测一次是否安装（不导入），未安装时不再逐句尝试导入失败
+_PYGAME_AVAILABLE = importlib.util.find_spec("pygame") is not None
+_PLAYSOUND_AVAILABLE = importlib.util.find_spec("playsound") is not None
+
+
+# 语音合成请求超时（秒），短于共享客户端的默认超时
+_SYNTHESIZE_TIMEOUT = 60.0
+
+# 预热连接的超时（秒）：仅用于提前完成 TCP/TLS 握手，失败不影响使用
+_WARMUP_TIMEOUT = 5.0
+
+# 流式合成时每次读取的分块大小（字节）
+_STREAM_CHUNK_SIZE = 16 * 1024
+
+# 播放队列容量：队列满时 speak 等待空位，而不是丢弃语音
+_PLAYBACK_QUEUE_SIZE = 16
+
+# 播放器为 ffplay 时（非 Windows 且未安装 miniaudio）可边接收边播放
+_STREAM_PLAYBACK_AVAILABLE = miniaudio is None and sys.platform != "win32"
+
+# 磁盘语音缓存：欢迎语、成功提示、常见步骤等固定语句重复播放时无需再请求接口
+_DISK_CACHE_DIR = _default_cache_dir()
+_DISK_CACHE_MAX_BYTES = 10 * 1024 * 1024
+
+# 内存语音缓存：本次会话内重复的语句连磁盘读取也省去
+_MEMORY_CACHE_MAX_BYTES = 2 * 1024 * 1024
+
+# MPEG Layer III 帧头查表：比特率（kbps）与采样率，按 MPEG 版本区分
+_MP3_BITRATES = {
+    "mpeg1": (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    "mpeg2": (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_MP3_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+# 无法解析帧头时按合成格式的 128kbps 估算时长
+_MP3_DEFAULT_BYTES_PER_SECOND = 128000 / 8
+
+# Windows 回退播放方式使用的临时文件数量：轮流覆盖写入，不再逐句创建和删除
+_PLAYBACK_SLOTS = 4
+
+
+def _prepare_private_dir(path: Path) -> bool:
+    """创建仅当前用户可访问的目录；目录已存在但不属于当前用户（或是符号链接）时返回 False"""
+    path.mkdir(mode=0o700, parents=True, exist_ok=True)
+    if not hasattr(os, "getuid"):
+        # Windows：缓存位于当前用户的 LOCALAPPDATA 下，由系统账户权限隔离
+        return True
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid():
+        return False
+    if st.st_mode & 0o077:
+        os.chmod(path, 0o700)
+    return True
+
+
+def _read_cache_file(path: Path) -> bytes:
+    """读取缓存文件并刷新修改时间（重启后仍按最近使用顺序淘汰）"""
+    data = path.read_bytes()
+    os.utime(path)
+    return data
+
+
+def _write_cache_file(path: Path, data: bytes) -> None:
+    """原子写入缓存文件，避免并发读到写了一半的音频"""
+    temp_path = path.with_suffix(".tmp")
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_NOFOLLOW", 0), 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+def _mp3_duration(data: bytes) -> float:
+    """逐帧累加 MP3 帧头中的采样数计算播放时长（秒）"""
+    pos = 0
+    # 跳过 ID3v2 标签
+    if data[:3] == b"ID3" and len(data) >= 10:
+        pos = 10 + ((data[6] & 0x7F) << 21 | (data[7] & 0x7F) << 14 | (data[8] & 0x7F) << 7 | (data[9] & 0x7F))
+    
+    duration = 0.0
+    while pos + 4 <= len(data):
+        b1, b2 = data[pos + 1], data[pos + 2]
+        version = (b1 >> 3) & 0x03
+        if data[pos] != 0xFF or (b1 & 0xE0) != 0xE0 or version == 1 or (b1 >> 1) & 0x03 != 1:
+            break
+        bitrate_index, rate_index = b2 >> 4, (b2 >> 2) & 0x03
+        if bitrate_index in (0, 15) or rate_index == 3:
+            break
+        
+        mpeg1 = version == 3
+        bitrate = _MP3_BITRATES["mpeg1" if mpeg1 else "mpeg2"][bitrate_index] * 1000
+        sample_rate = _MP3_SAMPLE_RATES[version][rate_index]
+        samples = 1152 if mpeg1 else 576
+        pos += samples // 8 * bitrate // sample_rate + ((b2 >> 1) & 0x01)
+        duration += samples / sample_rate
+    
+    if duration == 0.0:
+        return len(data) / _MP3_DEFAULT_BYTES_PER_SECOND
+    return duration
 
 
 @dataclass
@@ -35,24 +161,80 @@ class TTSService:
         self._easyllm_id = "143peGYFl1Kh1ihRDWrE3f"
         self._api_key = config.api.api_key
         self._base_url = "https://www.sophnet.com/api/open-apis"
+        self._synthesize_url = (
+            f"{self._base_url}/projects/{self._project_id}/easyllms/voice/synthesize-audio"
+        )
         self._client: Optional[httpx.AsyncClient] = None
         self._config = TTSConfig()
-        self._is_speaking = False
+        # 请求头和请求体模板只构建一次，每次合成只替换文本
+        self._headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self._api_key}",
+        }
+        self._base_payload = self._build_base_payload()
+        # 播放队列：元素为 (合成任务或流式音频, 播放完成通知)，由单个后台任务按顺序播放
+        self._queue: asyncio.Queue[
+            tuple[Union[asyncio.Task, AsyncIterator[bytes]], Optional[asyncio.Future]]
+        ] = asyncio.Queue(maxsize=_PLAYBACK_QUEUE_SIZE)
+        self._worker: Optional[asyncio.Task] = None
+        self._playing = False
+        # 磁盘缓存索引：缓存键 -> 文件大小，按最近使用排序；首次使用时扫描目录建立
+        self._cache_dir = _DISK_CACHE_DIR
+        self._cache_index: Optional[OrderedDict[str, int]] = None
+        self._cache_bytes = 0
+        # 缓存目录校验未通过时不读写磁盘缓存，只用内存缓存
+        self._disk_cache_enabled = False
+        # 内存缓存：缓存键 -> 音频数据，按最近使用排序，与磁盘缓存共用缓存键
+        self._mem_cache: OrderedDict[str, bytes] = OrderedDict()
+        self._mem_bytes = 0
+        # 播放用临时文件，轮流复用；外部播放器仍占用上一个文件时写入的是另一个
+        self._playback_slots: deque[Path] = deque(
+            self._cache_dir / "playback" / f"playback_{i}.mp3" for i in range(_PLAYBACK_SLOTS)
+        )
+        # pygame 混音器只初始化一次并保持打开；None 表示尚未尝试
+        self._pygame_ready: Optional[bool] = None
+        self._warmup: Optional[asyncio.Task] = None
+        # 正在合成的语句：缓存键 -> 合成任务，相同语句并发请求时只发一次
+        self._inflight: dict[str, asyncio.Future] = {}
 
     async def initialize(self) -> None:
         """初始化服务"""
-        self._client = httpx.AsyncClient(timeout=60.0)
+        self._client = http_utils.get_shared_client()
+        self._ensure_worker()
+        # 后台预热连接，首句语音合成时复用已建立的长连接
+        self._warmup = asyncio.create_task(self._warm_up_connection())
         logger.info("TTS服务初始化完成")
     
     async def close(self) -> None:
-        """关闭服务"""
-        if self._client:
-            await self._client.aclose()
-            self._client = None
+        """关闭服务（共享客户端由应用退出时统一关闭）"""
+        if self._worker:
+            self._worker.cancel()
+            self._worker = None
+        if self._warmup:
+            self._warmup.cancel()
+            self._warmup = None
+        
+        # 丢弃尚未播放的语音，并唤醒等待它们的调用方
+        while not self._queue.empty():
+            source, done = self._queue.get_nowait()
+            if isinstance(source, asyncio.Task):
+                source.cancel()
+            if done is not None and not done.done():
+                done.set_result(None)
+        
+        self._client = None
+    
+    async def _warm_up_connection(self) -> None:
+        """向接口主机发一个 HEAD 请求，提前建立连接放入连接池"""
+        try:
+            await self._client.head(self._base_url, timeout=_WARMUP_TIMEOUT)
+        except httpx.HTTPError as e:
+            logger.debug(f"TTS连接预热失败: {e}")
     
     def set_speed(self, speed: float) -> None:
         """设置语速 (0.5-2.0)"""
         self._config.speech_rate = max(0.5, min(2.0, speed))
+        self._base_payload = self._build_base_payload()
     
     async def synthesize(self, text: str) -> bytes:
         """合成语音（非流式）"""
@@ -62,16 +244,89 @@ class TTSService:
         if not text.strip():
             return b""
         
-        url = f"{self._base_url}/projects/{self._project_id}/easyllms/voice/synthesize-audio"
+        body = self._build_body(text)
+        cache_key = self._cache_key(body)
+        inflight = self._inflight.get(cache_key)
+        if inflight is not None:
+            logger.debug("相同语句正在合成，等待其结果")
+            return await asyncio.shield(inflight)
         
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self._api_key}",
-        }
+        future = asyncio.ensure_future(self._fetch_audio(cache_key, body))
+        self._inflight[cache_key] = future
+        try:
+            # shield：某个调用方被取消时不影响其他等待同一结果的调用方
+            return await asyncio.shield(future)
+        finally:
+            if self._inflight.get(cache_key) is future:
+                del self._inflight[cache_key]
+    
+    async def _fetch_audio(self, cache_key: str, body: bytes) -> bytes:
+        """读取缓存，未命中时请求接口合成"""
+        cached = await self._get_cached_audio(cache_key)
+        if cached:
+            return cached
+        
+        try:
+            response = await self._client.post(
+                self._synthesize_url,
+                headers=self._headers,
+                content=body,
+                timeout=_SYNTHESIZE_TIMEOUT,
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            logger.error(f"TTS请求失败: {e}")
+            return b""
+        
+        audio_data = response.content
+        if audio_data:
+            await self._store_audio(cache_key, audio_data)
+        return audio_data
+    
+    async def synthesize_stream(self, text: str) -> AsyncIterator[bytes]:
+        """流式合成语音，边接收边产出音频分块
+        
+        缓存命中时一次产出完整音频；完整接收后的音频写入缓存，
+        中途失败或调用方提前结束时不缓存不完整的音频。
+        """
+        if not self._client:
+            raise RuntimeError("TTS服务未初始化")
+        
+        if not text.strip():
+            return
         
-        payload = {
+        body = self._build_body(text)
+        cache_key = self._cache_key(body)
+        cached = await self._get_cached_audio(cache_key)
+        if cached:
+            yield cached
+            return
+        
+        audio_data = bytearray()
+        try:
+            async with self._client.stream(
+                "POST",
+                self._synthesize_url,
+                headers=self._headers,
+                content=body,
+                timeout=_SYNTHESIZE_TIMEOUT,
+            ) as response:
+                response.raise_for_status()
+                async for chunk in response.aiter_bytes(_STREAM_CHUNK_SIZE):
+                    audio_data.extend(chunk)
+                    yield chunk
+        except httpx.HTTPError as e:
+            logger.error(f"TTS流式请求失败: {e}")
+            return
+        
+        if audio_data:
+            await self._store_audio(cache_key, bytes(audio_data))
+    
+    def _build_base_payload(self) -> dict:
+        """根据当前合成参数构建请求体模板（参数变化时重新构建）"""
+        return {
             "easyllm_id": self._easyllm_id,
-            "text": [text],
+            "text": [""],
             "synthesis_param": {
                 "model": self._config.model,
                 "voice": self._config.voice,
@@ -81,31 +336,182 @@ class TTSService:
                 "pitchRate": self._config.pitch_rate,
             }
         }
+    
+    def _build_body(self, text: str) -> bytes:
+        """构建序列化后的合成请求体
+        
+        模板在此处立即序列化，之后其他协程再修改模板也不影响本次请求。
+        """
+        self._base_payload["text"][0] = text
+        return json_utils.dumps(self._base_payload)
+    
+    async def _get_cached_audio(self, cache_key: str) -> Optional[bytes]:
+        """依次查找内存缓存和磁盘缓存，未命中返回 None"""
+        cached = self._mem_cache.get(cache_key)
+        if cached is not None:
+            self._mem_cache.move_to_end(cache_key)
+            return cached
         
+        cached = await self._read_disk_cache(cache_key)
+        if cached:
+            self._store_mem_cache(cache_key, cached)
+        return cached
+    
+    async def _store_audio(self, cache_key: str, audio_data: bytes) -> None:
+        """合成结果写入内存缓存和磁盘缓存"""
+        self._store_mem_cache(cache_key, audio_data)
+        await self._write_disk_cache(cache_key, audio_data)
+    
+    @staticmethod
+    def _cache_key(body: bytes) -> str:
+        """缓存键：请求体（文本与全部合成参数）的哈希，语速、音色等变化时不会误用旧音频"""
+        return hashlib.sha256(body).hexdigest()
+    
+    def _store_mem_cache(self, cache_key: str, audio_data: bytes) -> None:
+        """写入内存缓存，超出容量时淘汰最久未用的语音"""
+        self._mem_bytes += len(audio_data) - len(self._mem_cache.pop(cache_key, b""))
+        self._mem_cache[cache_key] = audio_data
+        while self._mem_bytes > _MEMORY_CACHE_MAX_BYTES and len(self._mem_cache) > 1:
+            _, old = self._mem_cache.popitem(last=False)
+            self._mem_bytes -= len(old)
+    
+    def _load_cache_index(self) -> OrderedDict[str, int]:
+        """扫描缓存目录建立 LRU 索引（按修改时间排序，最久未用的在前）
+        
+        只收录当前用户自己写入的普通文件，目录不可信时索引为空且不再写入。
+        """
+        if self._cache_index is None:
+            entries = []
+            try:
+                self._disk_cache_enabled = _prepare_private_dir(self._cache_dir)
+                if not self._disk_cache_enabled:
+                    logger.warning(f"TTS缓存目录不属于当前用户，停用磁盘缓存: {self._cache_dir}")
+                else:
+                    uid = os.getuid() if hasattr(os, "getuid") else None
+                    with os.scandir(self._cache_dir) as it:
+                        for entry in it:
+                            if not entry.name.endswith(".mp3") or not entry.is_file(follow_symlinks=False):
+                                continue
+                            st = entry.stat(follow_symlinks=False)
+                            if uid is None or st.st_uid == uid:
+                                entries.append((st.st_mtime, entry.name[:-4], st.st_size))
+            except OSError as e:
+                logger.warning(f"TTS缓存目录不可用，停用磁盘缓存: {e}")
+                self._disk_cache_enabled = False
+            entries.sort()
+            self._cache_index = OrderedDict((key, size) for _, key, size in entries)
+            self._cache_bytes = sum(self._cache_index.values())
+        return self._cache_index
+    
+    async def _read_disk_cache(self, cache_key: str) -> Optional[bytes]:
+        """读取磁盘缓存，未命中返回 None"""
+        index = self._load_cache_index()
+        if cache_key not in index:
+            return None
+        
+        path = self._cache_dir / f"{cache_key}.mp3"
         try:
-            response = await self._client.post(url, headers=headers, json=payload)
-            response.raise_for_status()
-            return response.content
-        except httpx.HTTPError as e:
-            logger.error(f"TTS请求失败: {e}")
-            return b""
-
-    async def speak(self, text: str) -> None:
-        """播放语音"""
-        if self._is_speaking:
-            return
+            data = await asyncio.get_event_loop().run_in_executor(None, _read_cache_file, path)
+        except OSError:
+            self._cache_bytes -= index.pop(cache_key)
+            return None
         
-        self._is_speaking = True
+        index.move_to_end(cache_key)
+        logger.debug("TTS磁盘缓存命中: {}", cache_key[:12])
+        return data
+    
+    async def _write_disk_cache(self, cache_key: str, audio_data: bytes) -> None:
+        """写入磁盘缓存，超出容量时淘汰最久未用的语音"""
+        index = self._load_cache_index()
+        if not self._disk_cache_enabled:
+            return
+        path = self._cache_dir / f"{cache_key}.mp3"
         try:
-            audio_data = await self.synthesize(text)
-            if audio_data:
-                await self._play_audio(audio_data)
-        finally:
-            self._is_speaking = False
+            await asyncio.get_event_loop().run_in_executor(None, _write_cache_file, path, audio_data)
+        except OSError as e:
+            logger.warning(f"写入TTS缓存失败: {e}")
+            return
+        
+        self._cache_bytes += len(audio_data) - index.pop(cache_key, 0)
+        index[cache_key] = len(audio_data)
+        
+        while self._cache_bytes > _DISK_CACHE_MAX_BYTES and len(index) > 1:
+            old_key, size = index.popitem(last=False)
+            self._cache_bytes -= size
+            try:
+                (self._cache_dir / f"{old_key}.mp3").unlink()
+            except OSError:
+                pass
+    
+    async def speak(self, text: str) -> None:
+        """播放语音（排队按顺序播放，返回时该句已播放完毕）
+        
+        入队时即开始合成，前一句播放期间下一句已在合成。
+        """
+        await self._enqueue(self._audio_source(text))
+    
+    def prefetch(self, texts: list[str]) -> list[asyncio.Task]:
+        """提前发起语音合成，返回的任务与 texts 一一对应
+        
+        配合 speak_prefetched 使用：播放当前语音时后续语音已在合成，
+        除第一句外的合成延迟都被播放时间掩盖。
+        接口对多段文本只返回一段连续音频，无法按句切分，因此逐句并发请求。
+        """
+        return [asyncio.create_task(self.synthesize(text)) for text in texts]
+    
+    async def speak_prefetched(self, audio_task: asyncio.Task) -> None:
+        """播放 prefetch 预先合成的语音"""
+        await self._enqueue(audio_task)
     
     async def speak_async(self, text: str) -> None:
-        """异步播放语音（不阻塞）"""
-        asyncio.create_task(self.speak(text))
+        """异步播放语音（入队后立即返回，不等待播放完成）"""
+        await self._enqueue(self._audio_source(text), wait=False)
+    
+    def _audio_source(self, text: str) -> Union[asyncio.Task, AsyncIterator[bytes]]:
+        """播放队列空闲时的第一句使用流式合成，收到首个分块即开始播放；
+        其余语句入队即开始合成，合成延迟已被前一句的播放时间掩盖
+        """
+        if _STREAM_PLAYBACK_AVAILABLE and not self._playing and self._queue.empty():
+            return self.synthesize_stream(text)
+        return asyncio.create_task(self.synthesize(text))
+    
+    def _ensure_worker(self) -> None:
+        """确保播放任务在运行"""
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._playback_worker())
+    
+    async def _enqueue(
+        self, source: Union[asyncio.Task, AsyncIterator[bytes]], wait: bool = True
+    ) -> None:
+        """语音加入播放队列；wait 为 True 时等待该句播放完成"""
+        self._ensure_worker()
+        done = asyncio.get_running_loop().create_future() if wait else None
+        await self._queue.put((source, done))
+        if done is not None:
+            await done
+    
+    async def _playback_worker(self) -> None:
+        """播放队列消费者：按入队顺序逐句播放"""
+        while True:
+            source, done = await self._queue.get()
+            self._playing = True
+            try:
+                if not isinstance(source, asyncio.Task):
+                    await self._play_stream(source)
+                    continue
+                # 用 wait 而非直接 await：合成任务被调用方取消时不影响播放任务本身
+                await asyncio.wait({source})
+                if not source.cancelled():
+                    audio_data = source.result()
+                    if audio_data:
+                        await self._play_audio(audio_data)
+            except Exception as e:
+                logger.error(f"语音播放失败: {e}")
+            finally:
+                self._playing = False
+                if done is not None and not done.done():
+                    done.set_result(None)
+                self._queue.task_done()
     
     async def speak_status(self, status: str) -> None:
         """播放状态提示"""
@@ -133,79 +539,158 @@ class TTSService:
         if not audio_data:
             logger.warning("音频数据为空，跳过播放")
             return
+        
+        # 优先在进程内直接从内存解码播放，无需临时文件和子进程
+        if await self._play_with_miniaudio(audio_data):
+            return
+        
+        if sys.platform != "win32":
+            # Linux/Mac: 通过标准输入把音频交给 ffplay，无需临时文件
+            await self._play_with_ffplay(audio_data)
+            return
             
-        temp_path = None
+        # Windows: pygame 可直接从内存加载 MP3，无需写文件
+        if await self._play_with_pygame(audio_data):
+            return
+        
         try:
-            # 保存临时文件
-            with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as f:
-                f.write(audio_data)
-                temp_path = f.name
+            # 以下 Windows 播放方式只接受文件路径，轮流写入预留的播放文件
+            temp_path = str(self._next_playback_path(audio_data))
             
             logger.debug(f"音频文件保存到: {temp_path}, 大小: {len(audio_data)} bytes")
             
-            import subprocess
-            import sys
+            # 方法1: 尝试使用 playsound
+            played = await self._play_with_playsound(temp_path)
             
-            if sys.platform == "win32":
-                # 方法1: 尝试使用 pygame（最可靠）
-                played = await self._play_with_pygame(temp_path)
-                
-                # 方法2: 尝试使用 playsound
-                if not played:
-                    played = await self._play_with_playsound(temp_path)
-                
-                # 方法3: 使用 Windows Media Player (wmplayer)
-                if not played:
-                    played = await self._play_with_wmplayer(temp_path)
-                
-                # 方法4: 使用 PowerShell (最后的回退)
-                if not played:
-                    await self._play_with_powershell(temp_path)
-            else:
-                # Linux/Mac: 使用 ffplay 或 aplay
-                await asyncio.get_event_loop().run_in_executor(
-                    None,
-                    lambda: subprocess.run(
-                        ["ffplay", "-nodisp", "-autoexit", temp_path],
-                        capture_output=True
-                    )
-                )
+            # 方法2: 使用 Windows Media Player (wmplayer)
+            if not played:
+                played = await self._play_with_wmplayer(temp_path, _mp3_duration(audio_data))
+            
+            # 方法3: 使用 winmm MCI 接口 (最后的回退)
+            if not played:
+                await self._play_with_winmm(temp_path)
         except Exception as e:
             logger.error(f"播放音频失败: {e}")
-        finally:
-            # 延迟删除临时文件，确保播放完成
-            if temp_path and os.path.exists(temp_path):
-                await asyncio.sleep(0.5)
-                try:
-                    os.unlink(temp_path)
-                except:
-                    pass
     
-    async def _play_with_pygame(self, file_path: str) -> bool:
-        """使用 pygame 播放音频"""
+    def _next_playback_path(self, audio_data: bytes) -> Path:
+        """覆盖写入下一个播放文件并返回其路径"""
+        path = self._playback_slots[0]
+        self._playback_slots.rotate(-1)
+        path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        path.write_bytes(audio_data)
+        return path
+    
+    async def _play_with_miniaudio(self, audio_data: bytes) -> bool:
+        """使用 miniaudio 从内存解码播放 MP3"""
+        if miniaudio is None:
+            return False
         try:
-            import pygame
+            import time
             
             def play():
-                pygame.mixer.init()
-                pygame.mixer.music.load(file_path)
-                pygame.mixer.music.play()
-                while pygame.mixer.music.get_busy():
-                    pygame.time.Clock().tick(10)
-                pygame.mixer.quit()
+                duration = miniaudio.mp3_get_info(audio_data).duration
+                stream = miniaudio.stream_memory(audio_data)
+                with miniaudio.PlaybackDevice() as device:
+                    device.start(stream)
+                    # 设备在后台线程取数据，等待播放结束后再关闭
+                    time.sleep(duration + 0.1)
             
             await asyncio.get_event_loop().run_in_executor(None, play)
+            logger.debug("miniaudio 播放成功")
+            return True
+        except Exception as e:
+            logger.debug(f"miniaudio 播放失败: {e}")
+            return False
+    
+    async def _play_with_ffplay(self, audio_data: bytes) -> bool:
+        """使用 ffplay 从标准输入播放（Linux/Mac）"""
+        try:
+            process = await asyncio.create_subprocess_exec(
+                "ffplay", "-nodisp", "-autoexit", "-loglevel", "quiet", "-i", "-",
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.DEVNULL,
+            )
+            await process.communicate(audio_data)
+            return process.returncode == 0
+        except Exception as e:
+            logger.error(f"播放音频失败: {e}")
+            return False
+    
+    async def _play_stream(self, chunks: AsyncIterator[bytes]) -> None:
+        """边接收边通过标准输入交给 ffplay 播放（Linux/Mac）"""
+        async with aclosing(chunks):
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    "ffplay", "-nodisp", "-autoexit", "-loglevel", "quiet", "-i", "-",
+                    stdin=asyncio.subprocess.PIPE,
+                    stdout=asyncio.subprocess.DEVNULL,
+                    stderr=asyncio.subprocess.DEVNULL,
+                )
+            except Exception as e:
+                logger.error(f"播放音频失败: {e}")
+                # 仍接收完整音频，使其写入缓存
+                async for _ in chunks:
+                    pass
+                return
+            
+            try:
+                async for chunk in chunks:
+                    process.stdin.write(chunk)
+                    await process.stdin.drain()
+                process.stdin.close()
+                await process.wait()
+            except (BrokenPipeError, ConnectionResetError) as e:
+                logger.error(f"播放音频失败: {e}")
+            finally:
+                if process.returncode is None:
+                    process.kill()
+                    await process.wait()
+    
+    async def _play_with_pygame(self, audio_data: bytes) -> bool:
+        """使用 pygame 从内存播放音频"""
+        if not _PYGAME_AVAILABLE:
+            return False
+        if self._pygame_ready is None:
+            self._pygame_ready = await asyncio.get_event_loop().run_in_executor(None, self._init_pygame)
+        if not self._pygame_ready:
+            return False
+        try:
+            import pygame
+            
+            pygame.mixer.music.load(io.BytesIO(audio_data), "mp3")
+            pygame.mixer.music.play()
+            # 在事件循环中轮询播放状态，不占用线程池
+            while pygame.mixer.music.get_busy():
+                await asyncio.sleep(0.05)
+            # 释放已加载的音频
+            pygame.mixer.music.unload()
             logger.debug("pygame 播放成功")
             return True
+        except Exception as e:
+            logger.debug(f"pygame 播放失败: {e}")
+            return False
+    
+    @staticmethod
+    def _init_pygame() -> bool:
+        """初始化 pygame 混音器（打开音频设备较慢，整个进程只做一次）"""
+        try:
+            import pygame
+            
+            # 与合成格式 MP3_16000HZ_MONO 一致，避免重采样
+            pygame.mixer.init(frequency=16000, channels=1)
+            return True
         except ImportError:
             logger.debug("pygame 未安装")
             return False
         except Exception as e:
-            logger.debug(f"pygame 播放失败: {e}")
+            logger.debug(f"pygame 初始化失败: {e}")
             return False
     
     async def _play_with_playsound(self, file_path: str) -> bool:
         """使用 playsound 播放音频"""
+        if not _PLAYSOUND_AVAILABLE:
+            return False
         try:
             from playsound import playsound
             
@@ -215,14 +700,11 @@ class TTSService:
             )
             logger.debug("playsound 播放成功")
             return True
-        except ImportError:
-            logger.debug("playsound 未安装")
-            return False
         except Exception as e:
             logger.debug(f"playsound 播放失败: {e}")
             return False
     
-    async def _play_with_wmplayer(self, file_path: str) -> bool:
+    async def _play_with_wmplayer(self, file_path: str, duration: float) -> bool:
         """使用 Windows Media Player 播放"""
         try:
             import subprocess
@@ -237,11 +719,8 @@ class TTSService:
                 )
             )
             
-            # 估算播放时间（根据文件大小）
-            file_size = os.path.getsize(file_path)
-            # MP3 128kbps ≈ 16KB/s
-            duration = max(1, file_size / 16000)
-            await asyncio.sleep(duration + 0.5)
+            # 播放器在后台播放，按音频实际时长等待
+            await asyncio.sleep(duration)
             
             logger.debug("wmplayer 播放完成")
             return True
@@ -249,50 +728,30 @@ class TTSService:
             logger.debug(f"wmplayer 播放失败: {e}")
             return False
     
-    async def _play_with_powershell(self, file_path: str) -> bool:
-        """使用 PowerShell 播放（回退方案）"""
+    async def _play_with_winmm(self, file_path: str) -> bool:
+        """使用 winmm MCI 接口播放（回退方案，进程内调用，无需启动 PowerShell）"""
         try:
-            import subprocess
+            import ctypes
             
-            # 使用更简单的 PowerShell 命令
-            ps_cmd = f'''
-            $player = New-Object Media.SoundPlayer "{file_path}"
-            $player.PlaySync()
-            '''
+            mci = ctypes.windll.winmm.mciSendStringW
+            alias = "elder_helper_tts"
             
-            # 如果是 MP3，需要用不同的方法
-            if file_path.endswith('.mp3'):
-                ps_cmd = f'''
-                Add-Type -AssemblyName PresentationCore
-                $player = New-Object System.Windows.Media.MediaPlayer
-                $player.Open([Uri]"{file_path}")
-                Start-Sleep -Milliseconds 300
-                $player.Play()
-                $duration = $player.NaturalDuration.TimeSpan.TotalSeconds
-                if ($duration -gt 0) {{
-                    Start-Sleep -Seconds ($duration + 0.5)
-                }} else {{
-                    Start-Sleep -Seconds 3
-                }}
-                $player.Close()
-                '''
-            
-            result = await asyncio.get_event_loop().run_in_executor(
-                None,
-                lambda: subprocess.run(
-                    ["powershell", "-ExecutionPolicy", "Bypass", "-Command", ps_cmd],
-                    capture_output=True,
-                    creationflags=subprocess.CREATE_NO_WINDOW,
-                    timeout=30
-                )
-            )
+            def play() -> int:
+                error = mci(f'open "{file_path}" type mpegvideo alias {alias}', None, 0, None)
+                if error:
+                    return error
+                try:
+                    # wait: 阻塞到播放结束，无需估算时长
+                    return mci(f"play {alias} wait", None, 0, None)
+                finally:
+                    mci(f"close {alias}", None, 0, None)
             
-            if result.returncode == 0:
-                logger.debug("PowerShell 播放成功")
-                return True
-            else:
-                logger.debug(f"PowerShell 播放失败: {result.stderr.decode('utf-8', errors='ignore')}")
+            error = await asyncio.get_event_loop().run_in_executor(None, play)
+            if error:
+                logger.debug(f"winmm 播放失败，错误码: {error}")
                 return False
+            logger.debug("winmm 播放成功")
+            return True
         except Exception as e:
-            logger.debug(f"PowerShell 播放异常: {e}")
+            logger.debug(f"winmm 播放异常: {e}")
             return False
@@ -2,9 +2,11 @@
 
 from __future__ import annotations
 
-import base64
+import asyncio
+import copy
+import hashlib
 import io
-import json
+from collections import OrderedDict
 from dataclasses import dataclass, field
 from enum import Enum
 
@@ -12,7 +14,80 @@ import httpx
 from loguru import logger
 from PIL import Image
 
+try:
+    from pybase64 import b64encode
+except ImportError:  # pybase64 为可选依赖（SIMD 加速），未安装时使用标准库
+    from base64 import b64encode
+
 from ..config import config
+from ..utils import http_utils, json_utils
+
+# VL 请求超时（秒）：多图推理较慢，长于共享客户端的默认超时
+_VL_TIMEOUT = 300.0
+
+# 页面状态分析提示词主体（用户意图部分按需追加）
+_STATE_ANALYSIS_PROMPT = """分析这个屏幕截图，准确描述当前页面状态。只返回JSON，不要其他文字。
+
+【重要】你必须准确识别当前屏幕显示的是什么：
+- 如果是 Windows 桌面（显示桌面图标、任务栏、壁纸），app_name 应该是 "Windows桌面"
+- 如果是某个应用程序窗口，app_name 应该是该应用的名称
+- 如果是浏览器，要区分是浏览器本身还是网页内容
+
+格式：
+{
+  "app_name": "应用名称（如：Windows桌面、微信、Chrome浏览器、文件资源管理器、系统设置）",
+  "screen_state": "页面状态简述（如：桌面、聊天界面、登录页面、主页、文件列表）",
+  "page_status": "normal/loading/error/dialog/login",
+  "is_desktop": true或false,
+  "has_open_window": true或false,
+  "foreground_app": "当前最前面的应用名称，如果是桌面则为空",
+  "description": "用简单语言描述当前屏幕显示的内容，适合老年人理解",
+  "available_elements": ["元素1名称", "元素2名称", "..."],
+  "element_locations": {
+    "元素名称": "大致位置描述（如：屏幕底部中间、右上角、左侧列表）"
+  },
+  "suggested_action": "建议用户下一步做什么",
+  "warnings": ["如果有安全风险或异常，在这里提醒"]
+}
+
+【判断规则】
+1. 如果看到桌面壁纸和桌面图标，is_desktop = true
+2. 如果有应用窗口覆盖在桌面上，has_open_window = true
+3. 如果是全屏应用或最大化窗口，is_desktop = false
+4. foreground_app 是当前用户正在操作的应用
+
+注意：
+1. 不需要返回精确坐标，只需要描述元素的大致位置
+2. available_elements 只列出可交互的元素（按钮、输入框、链接等）
+3. 用老年人能理解的语言描述"""
+
+# 有用户意图时追加在提示词主体之后
+_STATE_INTENT_PROMPT = "\n\n用户想要：{user_intent}\n请重点关注与用户意图相关的元素，并判断当前屏幕状态是否已经满足用户需求。"
+
+# 页面状态分析缓存条数：同一画面（如反复回到桌面）再次分析时直接复用结果
+_STATE_CACHE_SIZE = 128
+
+
+def _image_mime(data: bytes) -> str:
+    """根据文件头判断图片类型（截图可能是 JPEG/WebP，外部传入的图片多为 PNG）"""
+    if data.startswith(b"\xff\xd8"):
+        return "image/jpeg"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return "image/png"
+
+
+def image_data_url(data: bytes) -> str:
+    """图片数据编码为 data URL（base64 输出为纯 ASCII，无需 UTF-8 校验）
+    
+    前缀与编码结果一次拼接，不再保留中间的 base64 字符串。
+    """
+    return f"data:{_image_mime(data)};base64," + b64encode(data).decode("ascii")
+
+
+async def _image_data_urls(*images: bytes) -> list[str]:
+    """在线程池中并行编码多张截图，编码期间不阻塞事件循环"""
+    return list(await asyncio.gather(*(asyncio.to_thread(image_data_url, image) for image in images)))
 
 
 class PageStatus(str, Enum):
@@ -25,7 +100,7 @@ class PageStatus(str, Enum):
     UNKNOWN = "unknown"        # 未知
 
 
-@dataclass
+@dataclass(slots=True)
 class VLConfig:
     """多模态模型配置"""
     api_key: str = ""
@@ -34,9 +109,12 @@ class VLConfig:
     model_light: str = "Qwen2.5-VL-72B-Instruct"
     # 兼容旧配置
     model: str = ""
+    # 截图上传格式：JPEG 体积约为 PNG 的 1/5~1/10，编码和上传都更快；需要无损时设为 PNG
+    screenshot_format: str = "JPEG"
+    screenshot_quality: int = 85
 
 
-@dataclass
+@dataclass(slots=True)
 class ScreenStateAnalysis:
     """第一层：页面状态分析结果"""
     app_name: str = ""                          # 当前应用名称
@@ -53,7 +131,7 @@ class ScreenStateAnalysis:
     foreground_app: str = ""                    # 当前最前面的应用
 
 
-@dataclass
+@dataclass(slots=True)
 class ScreenElement:
     """屏幕元素（含精确坐标）"""
     element_type: str = ""           # button, text, input, icon, etc.
@@ -70,7 +148,7 @@ class ScreenElement:
         return (x + w // 2, y + h // 2)
 
 
-@dataclass
+@dataclass(slots=True)
 class ScreenAnalysis:
     """第二层：完整屏幕分析结果（含坐标）- 兼容旧接口"""
     app_name: str = ""
@@ -94,6 +172,13 @@ class VisionService:
             )
 
         self._client: httpx.AsyncClient | None = None
+        # 请求头只构建一次（共享客户端还服务于其他接口，不设为客户端默认头）
+        self._headers = {
+            "Authorization": f"Bearer {self._config.api_key}",
+            "Content-Type": "application/json",
+        }
+        # 页面状态分析缓存：(截图哈希, 用户意图) -> 分析结果，按最近使用排序
+        self._state_cache: OrderedDict[tuple[bytes, str], ScreenStateAnalysis] = OrderedDict()
 
     def _build_api_url(self) -> str:
         """构建API URL"""
@@ -101,16 +186,14 @@ class VisionService:
 
     async def initialize(self) -> None:
         """初始化服务"""
-        self._client = httpx.AsyncClient(timeout=300.0)
+        self._client = http_utils.get_shared_client()
         logger.info("Vision服务初始化完成")
         logger.info(f"  - VL API URL: {self._build_api_url()}")
         logger.info(f"  - 模型: {self._config.model_light}")
 
     async def close(self) -> None:
-        """关闭服务"""
-        if self._client:
-            await self._client.aclose()
-            self._client = None
+        """关闭服务（共享客户端由应用退出时统一关闭）"""
+        self._client = None
 
     # ==================== 通用方法 ====================
 
@@ -126,30 +209,30 @@ class VisionService:
             raise RuntimeError("Vision服务未初始化")
 
         url = self._build_api_url()
+        # 请求体只序列化一次，重试时直接复用
+        body = json_utils.dumps({
+            "model": model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+        })
         last_error = None
 
         for attempt in range(max_retries):
             try:
-                logger.debug(f"调用VL API: model={model}, 尝试 {attempt + 1}/{max_retries}")
+                logger.debug("调用VL API: model={}, 尝试 {}/{}", model, attempt + 1, max_retries)
 
                 response = await self._client.post(
                     url,
-                    json={
-                        "model": model,
-                        "messages": messages,
-                        "max_tokens": max_tokens,
-                    },
-                    headers={
-                        "Authorization": f"Bearer {self._config.api_key}",
-                        "Content-Type": "application/json",
-                    },
+                    content=body,
+                    headers=self._headers,
+                    timeout=_VL_TIMEOUT,
                 )
                 response.raise_for_status()
 
-                result = response.json()
+                result = json_utils.loads(response.content)
                 if "choices" in result and len(result["choices"]) > 0:
                     content = result["choices"][0]["message"]["content"]
-                    logger.debug(f"VL API响应长度: {len(content)}")
+                    logger.debug("VL API响应长度: {}", len(content))
                     return content
 
                 logger.warning(f"未知的API响应格式: {result}")
@@ -166,7 +249,6 @@ class VisionService:
                 last_error = e
                 if attempt < max_retries - 1:
                     # 等待后重试
-                    import asyncio
                     await asyncio.sleep(2 ** attempt)  # 指数退避: 1s, 2s, 4s
                     continue
             except httpx.HTTPError as e:
@@ -198,7 +280,11 @@ class VisionService:
                 img = self._resize_if_needed(img)
 
                 buffer = io.BytesIO()
-                img.save(buffer, format="PNG", optimize=True)
+                image_format = self._config.screenshot_format.upper()
+                if image_format == "PNG":
+                    img.save(buffer, format="PNG", optimize=True)
+                else:
+                    img.save(buffer, format=image_format, quality=self._config.screenshot_quality)
                 return buffer.getvalue(), original_size
 
         except Exception as e:
@@ -211,8 +297,10 @@ class VisionService:
         if width > max_size or height > max_size:
             ratio = min(max_size / width, max_size / height)
             new_size = (int(width * ratio), int(height * ratio))
-            logger.debug(f"缩放图片: {width}x{height} -> {new_size[0]}x{new_size[1]}")
-            return img.resize(new_size, Image.Resampling.LANCZOS)
+            logger.debug("缩放图片: {}x{} -> {}x{}", width, height, *new_size)
+            # 双线性插值足够模型识别界面，比 LANCZOS 快数倍；
+            # reducing_gap: 缩小倍数较大时先做整数倍盒式降采样，再插值到目标尺寸
+            return img.resize(new_size, Image.Resampling.BILINEAR, reducing_gap=2.0)
         return img
 
     # ==================== 页面状态分析 ====================
@@ -234,14 +322,21 @@ class VisionService:
         if not self._client or not screenshot:
             return ScreenStateAnalysis()
 
+        cache_key = (hashlib.blake2b(screenshot, digest_size=16).digest(), user_intent)
+        cached = self._state_cache.get(cache_key)
+        if cached is not None:
+            self._state_cache.move_to_end(cache_key)
+            logger.debug("页面状态分析缓存命中")
+            # 返回副本，调用方修改结果不影响缓存
+            return copy.deepcopy(cached)
+
         try:
-            image_base64 = base64.b64encode(screenshot).decode("utf-8")
             prompt = self._build_state_analysis_prompt(user_intent)
 
             messages = [{
                 "role": "user",
                 "content": [
-                    {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{image_base64}"}},
+                    {"type": "image_url", "image_url": {"url": image_data_url(screenshot)}},
                     {"type": "text", "text": prompt}
                 ]
             }]
@@ -252,7 +347,13 @@ class VisionService:
                 max_tokens=1500,
             )
 
-            return self._parse_state_analysis(content)
+            analysis = self._parse_state_analysis(content)
+            # 只缓存成功解析的结果，解析失败时下次重新请求
+            if analysis.app_name or analysis.screen_state:
+                self._state_cache[cache_key] = copy.deepcopy(analysis)
+                if len(self._state_cache) > _STATE_CACHE_SIZE:
+                    self._state_cache.popitem(last=False)
+            return analysis
 
         except Exception as e:
             logger.error(f"页面状态分析失败: {e}")
@@ -260,52 +361,16 @@ class VisionService:
 
     def _build_state_analysis_prompt(self, user_intent: str) -> str:
         """构建页面状态分析提示词"""
-        prompt = """分析这个屏幕截图，准确描述当前页面状态。只返回JSON，不要其他文字。
-
-【重要】你必须准确识别当前屏幕显示的是什么：
-- 如果是 Windows 桌面（显示桌面图标、任务栏、壁纸），app_name 应该是 "Windows桌面"
-- 如果是某个应用程序窗口，app_name 应该是该应用的名称
-- 如果是浏览器，要区分是浏览器本身还是网页内容
-
-格式：
-{
-  "app_name": "应用名称（如：Windows桌面、微信、Chrome浏览器、文件资源管理器、系统设置）",
-  "screen_state": "页面状态简述（如：桌面、聊天界面、登录页面、主页、文件列表）",
-  "page_status": "normal/loading/error/dialog/login",
-  "is_desktop": true或false,
-  "has_open_window": true或false,
-  "foreground_app": "当前最前面的应用名称，如果是桌面则为空",
-  "description": "用简单语言描述当前屏幕显示的内容，适合老年人理解",
-  "available_elements": ["元素1名称", "元素2名称", "..."],
-  "element_locations": {
-    "元素名称": "大致位置描述（如：屏幕底部中间、右上角、左侧列表）"
-  },
-  "suggested_action": "建议用户下一步做什么",
-  "warnings": ["如果有安全风险或异常，在这里提醒"]
-}
-
-【判断规则】
-1. 如果看到桌面壁纸和桌面图标，is_desktop = true
-2. 如果有应用窗口覆盖在桌面上，has_open_window = true
-3. 如果是全屏应用或最大化窗口，is_desktop = false
-4. foreground_app 是当前用户正在操作的应用
-
-注意：
-1. 不需要返回精确坐标，只需要描述元素的大致位置
-2. available_elements 只列出可交互的元素（按钮、输入框、链接等）
-3. 用老年人能理解的语言描述"""
-
-        if user_intent:
-            prompt += f"\n\n用户想要：{user_intent}\n请重点关注与用户意图相关的元素，并判断当前屏幕状态是否已经满足用户需求。"
-
-        return prompt
+        if not user_intent:
+            return _STATE_ANALYSIS_PROMPT
+        return _STATE_ANALYSIS_PROMPT + _STATE_INTENT_PROMPT.format(user_intent=user_intent)
 
     def _parse_state_analysis(self, content: str) -> ScreenStateAnalysis:
         """解析页面状态分析结果"""
         try:
             json_str = self._extract_json(content)
             if json_str:
-                data = json.loads(json_str)
+                data = json_utils.loads(json_str)
 
                 # 解析页面状态枚举
                 status_str = data.get("page_status", "normal").lower()
@@ -361,8 +426,7 @@ class VisionService:
             raise RuntimeError("Vision服务未初始化")
 
         try:
-            before_b64 = base64.b64encode(before_screenshot).decode("utf-8")
-            after_b64 = base64.b64encode(after_screenshot).decode("utf-8")
+            before_url, after_url = await _image_data_urls(before_screenshot, after_screenshot)
 
             prompt = f"""比较这两张截图（第一张是操作前，第二张是操作后），判断用户的操作是否成功完成。
 
@@ -390,8 +454,8 @@ class VisionService:
             messages = [{
                 "role": "user",
                 "content": [
-                    {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{before_b64}"}},
-                    {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{after_b64}"}},
+                    {"type": "image_url", "image_url": {"url": before_url}},
+                    {"type": "image_url", "image_url": {"url": after_url}},
                     {"type": "text", "text": prompt}
                 ]
             }]
@@ -413,7 +477,7 @@ class VisionService:
         try:
             json_str = self._extract_json(content)
             if json_str:
-                data = json.loads(json_str)
+                data = json_utils.loads(json_str)
                 success = data.get("success", False) and data.get("matches_expected", False)
                 changes = data.get("changes", "")
                 reason = data.get("reason", "")
@@ -436,8 +500,7 @@ class VisionService:
             raise RuntimeError("Vision服务未初始化")
 
         try:
-            before_b64 = base64.b64encode(before_screenshot).decode("utf-8")
-            after_b64 = base64.b64encode(after_screenshot).decode("utf-8")
+            before_url, after_url = await _image_data_urls(before_screenshot, after_screenshot)
 
             prompt = f"""比较这两张屏幕截图（前后对比），判断操作是否成功。
 
@@ -453,8 +516,8 @@ class VisionService:
             messages = [{
                 "role": "user",
                 "content": [
-                    {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{before_b64}"}},
-                    {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{after_b64}"}},
+                    {"type": "image_url", "image_url": {"url": before_url}},
+                    {"type": "image_url", "image_url": {"url": after_url}},
                     {"type": "text", "text": prompt}
                 ]
             }]
@@ -482,8 +545,6 @@ class VisionService:
             return False, ""
 
         try:
-            image_b64 = base64.b64encode(screenshot).decode("utf-8")
-
             prompt = f"""判断用户的任务目标是否已经达成。
 
 任务目标：{task_goal}
@@ -512,7 +573,7 @@ class VisionService:
                     "content": [
                         {
                             "type": "image_url",
-                            "image_url": {"url": f"data:image/png;base64,{image_b64}"},
+                            "image_url": {"url": image_data_url(screenshot)},
                         },
                         {"type": "text", "text": prompt},
                     ],
@@ -527,7 +588,7 @@ class VisionService:
 
             json_str = self._extract_json(content)
             if json_str:
-                data = json.loads(json_str)
+                data = json_utils.loads(json_str)
                 return bool(data.get("goal_achieved", False)), str(data.get("reason", "")).strip()
         except Exception as e:
             logger.warning(f"检查任务目标失败: {e}")
@@ -1,3 +1,5 @@
 """工具模块"""
 
-__all__ = []
+from . import http_utils, json_utils
+
+__all__ = ["http_utils", "json_utils"]
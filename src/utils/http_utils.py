@@ -0,0 +1,63 @@
+"""HTTP 工具 - 统一构建 httpx 客户端（连接池 + 可选 HTTP/2）"""
+
+from __future__ import annotations
+
+from typing import Optional
+
+import httpx
+
+try:
+    import h2  # noqa: F401  httpx 的 HTTP/2 支持依赖 h2
+    _HTTP2_AVAILABLE = True
+except ImportError:  # h2 为可选依赖，未安装时使用 HTTP/1.1
+    _HTTP2_AVAILABLE = False
+
+# 同一主机的请求复用长连接，避免每轮对话重复 TLS 握手
+_LIMITS = httpx.Limits(
+    max_connections=32,
+    max_keepalive_connections=16,
+    keepalive_expiry=60.0,
+)
+
+# 建连超时单独设置，避免网络异常时等待整个读取超时
+_CONNECT_TIMEOUT = 10.0
+
+# 共享客户端的默认读写超时（秒），需要更短超时的请求可单独传入 timeout
+_SHARED_TIMEOUT = 120.0
+
+# 进程内共享的客户端：各服务访问同一 Sophnet 主机，共用一个连接池和 TLS 会话
+_shared_client: Optional[httpx.AsyncClient] = None
+
+
+def create_async_client(timeout: float, **kwargs) -> httpx.AsyncClient:
+    """创建启用连接池（及可用时 HTTP/2）的异步客户端
+    
+    Args:
+        timeout: 读写超时（秒）
+        **kwargs: 透传给 httpx.AsyncClient 的其他参数
+    """
+    return httpx.AsyncClient(
+        http2=_HTTP2_AVAILABLE,
+        timeout=httpx.Timeout(timeout, connect=_CONNECT_TIMEOUT),
+        limits=_LIMITS,
+        **kwargs,
+    )
+
+
+def get_shared_client() -> httpx.AsyncClient:
+    """获取进程内共享的异步客户端（首次调用时创建）
+    
+    使用方不应自行关闭该客户端，应用退出时统一调用 close_shared_client()。
+    """
+    global _shared_client
+    if _shared_client is None or _shared_client.is_closed:
+        _shared_client = create_async_client(timeout=_SHARED_TIMEOUT)
+    return _shared_client
+
+
+async def close_shared_client() -> None:
+    """关闭共享客户端（应用退出时调用一次）"""
+    global _shared_client
+    if _shared_client is not None:
+        await _shared_client.aclose()
+        _shared_client = None
@@ -0,0 +1,28 @@
+"""JSON 工具 - 优先使用 orjson，未安装时回退到标准库"""
+
+from __future__ import annotations
+
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # orjson 为可选依赖
+    orjson = None
+
+# orjson.JSONDecodeError 是 json.JSONDecodeError 的子类，统一捕获即可
+JSONDecodeError = json.JSONDecodeError
+
+
+def loads(data: str | bytes) -> Any:
+    """解析JSON（C实现，中文内容比标准库快数倍）"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj: Any) -> bytes:
+    """序列化为UTF-8编码的JSON字节串，可直接作为HTTP请求体"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
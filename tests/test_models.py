@@ -77,6 +77,18 @@ class TestAction:
         )
         desc = action.to_friendly_description()
         assert "确定按钮" in desc
+    
+    def test_skill_instruction(self):
+        """测试标准化技能指令"""
+        assert Action(
+            action_type=ActionType.SCROLL, scroll_direction="up",
+        ).to_skill_instruction() == "向上滚动{当前区域}"
+        assert Action(
+            action_type=ActionType.WAIT, wait_ms=2000,
+        ).to_skill_instruction() == "等待{2秒}"
+        assert Action(
+            action_type=ActionType.HOTKEY, hotkey="Ctrl+C",
+        ).to_skill_instruction() == "组合键{Ctrl+C}"
 
 
 class TestTaskPlan:
@@ -0,0 +1,473 @@
+"""规划解析测试（不调用API）"""
+
+import asyncio
+import gzip
+import json
+
+import httpx
+import pytest
+
+from src.models.intent import Intent
+from src.models.action import ActionType, ActionStatus
+from src.models.task import Task, TaskPlan, TaskStep
+from src.services.planner_service import PlannerService
+from src.services.vision_service import ScreenAnalysis
+
+
+@pytest.fixture
+def planner() -> PlannerService:
+    return PlannerService()
+
+
+class TestParsePlan:
+    """计划解析测试"""
+
+    def test_parse_valid_plan(self, planner):
+        """测试解析标准JSON计划"""
+        content = """好的，计划如下：
+{"steps": [
+    {"step_number": 1, "skill_type": "单击", "target": "开始按钮"},
+    {"step_number": 2, "skill_type": "输入", "text": "微信"},
+    {"step_number": 3, "skill_type": "向下滚动", "target": "应用列表"},
+    {"step_number": 4, "skill_type": "等待", "wait_seconds": 2}
+]}"""
+        plan = planner._parse_plan(content, Intent(raw_text="打开微信"))
+
+        assert len(plan.steps) == 4
+        assert plan.steps[0].action.action_type == ActionType.CLICK
+        assert plan.steps[0].description == "单击{开始按钮}"
+        assert plan.steps[1].action.text == "微信"
+        assert plan.steps[2].action.scroll_direction == "down"
+        assert plan.steps[3].action.wait_ms == 2000
+
+    def test_fix_invalid_skill_type(self, planner):
+        """测试修正非法 skill_type"""
+        content = '{"steps": [{"skill_type": "点击", "target": "确定按钮"}, {"skill_type": "飞行"}]}'
+        plan = planner._parse_plan(content, Intent())
+
+        assert len(plan.steps) == 1
+        assert plan.steps[0].action.action_type == ActionType.CLICK
+
+    def test_fix_skill_type_partial_match(self, planner):
+        """测试部分匹配优先选择更具体的错误写法"""
+        assert planner._fix_invalid_skill_type("鼠标右键点击") == "右键单击"
+        assert planner._fix_invalid_skill_type("Double_Click_Icon") == "双击"
+        assert planner._fix_invalid_skill_type("飞行") == "飞行"
+
+    def test_skill_type_to_action_type(self, planner):
+        """测试技能类型映射"""
+        assert planner._skill_type_to_action_type("组合键") == ActionType.HOTKEY
+        assert planner._skill_type_to_action_type("等待出现") == ActionType.WAIT_ELEMENT
+        assert planner._skill_type_to_action_type("未知") == ActionType.CLICK
+
+    def test_parse_plan_from_text(self, planner):
+        """测试JSON无效时回退到文本解析"""
+        content = "1. 点击开始按钮\n2) 输入微信\n- 点击微信图标\n说明文字"
+        plan = planner._parse_plan_from_text(content, Intent())
+
+        assert [s.description for s in plan.steps] == ["点击开始按钮", "输入微信", "点击微信图标"]
+
+
+class TestReplanOnError:
+    """重规划测试"""
+
+    @pytest.mark.asyncio
+    async def test_replan_includes_history_and_screen(self, planner):
+        """测试重规划提示包含执行历史、错误原因和当前屏幕"""
+        intent = Intent(raw_text="打开微信")
+        plan = TaskPlan(intent=intent, steps=[
+            TaskStep(step_number=1, description="单击{开始按钮}", status=ActionStatus.SUCCESS),
+            TaskStep(step_number=2, description="单击{微信图标}"),
+            TaskStep(step_number=3, description="完成{}"),
+        ], current_step_index=1)
+        task = Task(intent=intent, plan=plan)
+
+        captured = {}
+
+        async def fake_call_llm(system_prompt, user_prompt, **kwargs):
+            captured["system"] = system_prompt
+            captured["user"] = user_prompt
+            return '{"steps": [{"skill_type": "双击", "target": "微信图标"}]}'
+
+        planner._call_llm = fake_call_llm
+        new_plan = await planner.replan_on_error(
+            task, "找不到微信图标", ScreenAnalysis(app_name="Windows桌面"),
+        )
+
+        assert new_plan.steps[0].action.action_type == ActionType.DOUBLE_CLICK
+        assert captured["system"] == planner._get_system_prompt()
+        assert "步骤1 单击{开始按钮}：成功" in captured["user"]
+        assert "步骤2 单击{微信图标}：未完成" in captured["user"]
+        assert "步骤3" not in captured["user"]
+        assert "找不到微信图标" in captured["user"]
+        assert "当前应用：Windows桌面" in captured["user"]
+
+    @pytest.mark.asyncio
+    async def test_replan_keeps_only_recent_history(self, planner):
+        """测试重规划只保留最近的执行步骤"""
+        intent = Intent(raw_text="给儿子发微信")
+        steps = [TaskStep(step_number=i, description=f"单击{{按钮{i}}}") for i in range(1, 6)]
+        task = Task(intent=intent, plan=TaskPlan(intent=intent, steps=steps, current_step_index=4))
+
+        captured = {}
+
+        async def fake_call_llm(system_prompt, user_prompt, **kwargs):
+            captured["user"] = user_prompt
+            return '{"steps": []}'
+
+        planner._call_llm = fake_call_llm
+        await planner.replan_on_error(task, "找不到按钮")
+
+        assert "步骤2 " not in captured["user"]
+        assert all(f"步骤{i} " in captured["user"] for i in (3, 4, 5))
+        assert "找不到按钮" in captured["user"]
+
+
+class TestPlanCache:
+    """计划缓存测试"""
+
+    @pytest.mark.asyncio
+    async def test_unchanged_screen_reuses_plan(self, planner):
+        """测试相同意图和屏幕状态不重复调用LLM"""
+        calls = []
+
+        async def fake_call_llm(system_prompt, user_prompt, **kwargs):
+            calls.append(user_prompt)
+            return '{"steps": [{"skill_type": "单击", "target": "开始按钮"}]}'
+
+        planner._call_llm = fake_call_llm
+        intent = Intent(raw_text="打开微信")
+
+        first = await planner.create_plan(intent, ScreenAnalysis(app_name="Windows桌面"))
+        second = await planner.create_plan(intent, ScreenAnalysis(app_name="Windows桌面"))
+        await planner.create_plan(intent, ScreenAnalysis(app_name="微信"))
+
+        assert len(calls) == 2
+        assert second.steps[0].description == first.steps[0].description
+        # 命中缓存返回的是新的步骤对象
+        assert second.steps[0] is not first.steps[0]
+
+    @pytest.mark.asyncio
+    async def test_replan_bypasses_cache(self, planner):
+        """测试计划失败后重新规划时不复用缓存中的同一计划"""
+        calls = []
+
+        async def fake_call_llm(system_prompt, user_prompt, **kwargs):
+            calls.append(user_prompt)
+            return '{"steps": [{"skill_type": "单击", "target": "开始按钮"}]}'
+
+        planner._call_llm = fake_call_llm
+        intent = Intent(raw_text="打开微信")
+        screen = ScreenAnalysis(app_name="Windows桌面")
+
+        await planner.create_plan(intent, screen)
+        await planner.create_plan(intent, screen, use_cache=False)
+        # 失败的计划已被移出缓存，重新规划的结果也未缓存
+        await planner.create_plan(intent, screen)
+
+        assert len(calls) == 3
+        assert planner._plan_cache
+
+    @pytest.mark.asyncio
+    async def test_failed_plan_is_not_reused(self, planner):
+        """测试执行失败的计划移出缓存，回到原屏幕重试时重新规划"""
+        calls = []
+
+        async def fake_call_llm(system_prompt, user_prompt, **kwargs):
+            calls.append(user_prompt)
+            return '{"steps": [{"skill_type": "单击", "target": "开始按钮"}]}'
+
+        planner._call_llm = fake_call_llm
+        intent = Intent(raw_text="打开微信")
+        desktop = ScreenAnalysis(app_name="Windows桌面")
+
+        await planner.create_plan(intent, desktop)
+        planner.invalidate_last_plan()
+        await planner.create_plan(intent, ScreenAnalysis(app_name="开始菜单"), use_cache=False)
+        await planner.create_plan(intent, desktop)
+        assert len(calls) == 3
+
+        # 智能体路径：replan_on_error 同样使缓存中失败的计划失效
+        await planner.replan_on_error(Task(intent=intent), "没有反应")
+        await planner.create_plan(intent, desktop)
+        assert len(calls) == 5
+
+    @pytest.mark.asyncio
+    async def test_list_valued_parameters_are_cached(self, planner):
+        """测试参数值为列表或字典时仍能生成缓存键并命中缓存"""
+        calls = []
+
+        async def fake_call_llm(system_prompt, user_prompt, **kwargs):
+            calls.append(user_prompt)
+            return '{"steps": [{"skill_type": "输入", "text": "北京天气"}]}'
+
+        planner._call_llm = fake_call_llm
+        screen = ScreenAnalysis(app_name="浏览器")
+
+        def intent(keywords):
+            return Intent(raw_text="查天气", parameters={"keywords": keywords, "filter": {"day": "今天"}})
+
+        first = await planner.create_plan(intent(["北京", "天气"]), screen)
+        second = await planner.create_plan(intent(["北京", "天气"]), screen)
+        await planner.create_plan(intent(["上海", "天气"]), screen)
+
+        assert first.steps and second.steps
+        assert len(calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_similar_intent_reuses_plan(self, planner):
+        """测试意图表述不同但语义相近时复用缓存计划"""
+        calls = []
+        vectors = {"打开微信": [1.0, 0.0], "帮我打开微信": [0.99, 0.05], "关闭电脑": [0.0, 1.0]}
+
+        async def fake_call_llm(system_prompt, user_prompt, **kwargs):
+            calls.append(user_prompt)
+            return '{"steps": [{"skill_type": "单击", "target": "开始按钮"}]}'
+
+        class FakeRAG:
+            index_version = 0
+
+            async def retrieve_with_expansion(self, **kwargs):
+                raise RuntimeError("无知识库")
+
+            async def embed_texts(self, texts):
+                return [vectors[t] for t in texts]
+
+            def similarity(self, a, b):
+                return sum(x * y for x, y in zip(a, b, strict=True)) / (
+                    sum(x * x for x in a) ** 0.5 * sum(y * y for y in b) ** 0.5
+                )
+
+        planner._call_llm = fake_call_llm
+        planner.set_rag_service(FakeRAG())
+        screen = ScreenAnalysis(app_name="Windows桌面")
+
+        await planner.create_plan(Intent(raw_text="打开微信"), screen)
+        await planner.create_plan(Intent(raw_text="帮我打开微信"), screen)
+        await planner.create_plan(Intent(raw_text="关闭电脑"), screen)
+        # 文本相近但参数不同，不能复用
+        await planner.create_plan(
+            Intent(raw_text="帮我打开微信", parameters={"联系人": "儿子"}), screen,
+        )
+
+        assert len(calls) == 3
+
+
+class TestPrefetchKnowledge:
+    """知识预取测试"""
+
+    @pytest.mark.asyncio
+    async def test_prefetched_knowledge_is_reused(self, planner):
+        """测试预取的知识检索在规划时直接取用，不重复检索"""
+        retrievals = []
+        captured = {}
+
+        class FakeResult:
+            context = "【打开微信】\n1. 双击微信图标"
+            confidence = 0.9
+
+        class FakeRAG:
+            index_version = 0
+
+            async def retrieve_with_expansion(self, query, **kwargs):
+                retrievals.append(query)
+                return FakeResult()
+
+        async def fake_call_llm(system_prompt, user_prompt, **kwargs):
+            captured["user"] = user_prompt
+            return '{"steps": [{"skill_type": "双击", "target": "微信图标"}]}'
+
+        planner._call_llm = fake_call_llm
+        planner.set_rag_service(FakeRAG())
+        intent = Intent(raw_text="打开微信")
+
+        planner.prefetch_knowledge(intent)
+        # 预取在规划前已开始执行
+        await asyncio.sleep(0)
+        assert retrievals == ["打开微信"]
+        await planner.create_plan(intent)
+        assert retrievals == ["打开微信"]
+        assert "双击微信图标" in captured["user"]
+
+        # 再次规划同一意图时直接使用缓存的检索结果；索引更新后重新检索
+        await planner.replan_on_error(Task(intent=intent), "没有反应")
+        assert retrievals == ["打开微信"]
+        FakeRAG.index_version = 1
+        await planner.replan_on_error(Task(intent=intent), "没有反应")
+        assert retrievals == ["打开微信", "打开微信"]
+
+    @pytest.mark.asyncio
+    async def test_stale_prefetch_is_not_reused(self, planner):
+        """测试索引更新前发起的预取不被取用"""
+        captured = {}
+
+        class FakeResult:
+            confidence = 0.9
+
+            def __init__(self, context):
+                self.context = context
+
+        class FakeRAG:
+            index_version = 0
+
+            async def retrieve_with_expansion(self, query, **kwargs):
+                return FakeResult("新知识" if self.index_version else "旧知识")
+
+        async def fake_call_llm(system_prompt, user_prompt, **kwargs):
+            captured["user"] = user_prompt
+            return '{"steps": []}'
+
+        planner._call_llm = fake_call_llm
+        planner.set_rag_service(FakeRAG())
+        intent = Intent(raw_text="打开微信")
+
+        planner.prefetch_knowledge(intent)
+        stale = next(iter(planner._knowledge_tasks.values()))
+        # 预取已完成检索，但随后索引更新
+        await asyncio.sleep(0)
+        FakeRAG.index_version = 1
+        await planner.create_plan(intent)
+
+        assert "新知识" in captured["user"]
+        assert stale.done()
+        assert planner._knowledge_tasks == {}
+
+    @pytest.mark.asyncio
+    async def test_plan_cache_hit_cancels_prefetch(self, planner):
+        """测试命中规划缓存时取消未被取用的预取"""
+        started = asyncio.Event()
+
+        class FakeRAG:
+            index_version = 0
+
+            async def retrieve_with_expansion(self, query, **kwargs):
+                started.set()
+                await asyncio.sleep(10)
+
+        async def fake_call_llm(system_prompt, user_prompt, **kwargs):
+            return '{"steps": [{"skill_type": "双击", "target": "微信图标"}]}'
+
+        planner._call_llm = fake_call_llm
+        intent = Intent(raw_text="打开微信")
+        await planner.create_plan(intent)
+
+        planner.set_rag_service(FakeRAG())
+        planner.prefetch_knowledge(intent)
+        task = next(iter(planner._knowledge_tasks.values()))
+        await started.wait()
+        plan = await planner.create_plan(intent)
+        await asyncio.sleep(0)
+
+        assert plan.steps
+        assert task.cancelled()
+        assert planner._knowledge_tasks == {}
+
+
+class TestCallLLM:
+    """LLM调用测试（使用 MockTransport）"""
+
+    @pytest.mark.asyncio
+    async def test_json_mode_falls_back_when_unsupported(self, planner):
+        """测试服务端拒绝 response_format 时回退到普通模式"""
+        requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            body = json.loads(request.content)
+            requests.append(body)
+            if "response_format" in body:
+                return httpx.Response(400, json={"error": "response_format json_object is not supported"})
+            return httpx.Response(200, json={"choices": [{"message": {"content": "{}"}}]})
+
+        planner._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            first = await planner._call_llm("sys", "user", json_mode=True)
+            second = await planner._call_llm("sys", "user", json_mode=True)
+        finally:
+            # planner.close() 不关闭客户端，测试自建的客户端需显式关闭
+            await planner._client.aclose()
+
+        assert (first, second) == ("{}", "{}")
+        assert ["response_format" in r for r in requests] == [True, False, False]
+        assert requests[0]["max_tokens"] == 1200
+
+    @pytest.mark.asyncio
+    async def test_other_bad_request_keeps_json_mode(self, planner):
+        """测试与 response_format 无关的 400 错误直接抛出，不关闭 JSON 模式"""
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(400, json={"error": "maximum context length exceeded"})
+
+        planner._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            with pytest.raises(httpx.HTTPStatusError):
+                await planner._call_llm("sys", "user", json_mode=True)
+        finally:
+            await planner._client.aclose()
+
+        assert planner._json_mode_supported
+
+    @pytest.mark.asyncio
+    async def test_identical_concurrent_requests_are_coalesced(self, planner):
+        """测试相同的并发请求只发送一次"""
+        requests = []
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            await asyncio.sleep(0.01)
+            return httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}]})
+
+        planner._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            results = await asyncio.gather(
+                planner._call_llm("sys", "user"),
+                planner._call_llm("sys", "user"),
+                planner._call_llm("sys", "other"),
+            )
+        finally:
+            await planner._client.aclose()
+
+        assert results == ["ok", "ok", "ok"]
+        assert len(requests) == 2
+        assert planner._inflight_llm == {}
+
+    @pytest.mark.asyncio
+    async def test_rate_limited_request_is_retried(self, planner):
+        """测试 429 时按 Retry-After 重试"""
+        statuses = [429, 503, 200]
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            status = statuses.pop(0)
+            if status != 200:
+                return httpx.Response(status, headers={"Retry-After": "0"})
+            return httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}]})
+
+        planner._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            result = await planner._call_llm("sys", "user")
+        finally:
+            await planner._client.aclose()
+
+        assert result == "ok"
+        assert statuses == []
+
+    @pytest.mark.asyncio
+    async def test_large_request_body_is_gzipped(self, planner):
+        """测试开启压缩后大请求体以 gzip 发送"""
+        bodies = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            bodies.append((request.headers.get("Content-Encoding"), request.content))
+            return httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}]})
+
+        planner._gzip_requests = True
+        planner._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            await planner._call_llm(planner._get_system_prompt(), "打开微信")
+            await planner._call_llm("sys", "user")
+        finally:
+            await planner._client.aclose()
+
+        (encoding, body), (small_encoding, _) = bodies
+        assert encoding == "gzip"
+        assert json.loads(gzip.decompress(body))["messages"][1]["content"] == "打开微信"
+        assert small_encoding is None
@@ -17,6 +17,9 @@ def create_mock_embedding_service():
     """创建模拟的嵌入服务"""
     service = MagicMock(spec=EmbeddingService)
     service.embed_text = AsyncMock(return_value=[0.1, 0.2, 0.3, 0.4, 0.5])
+    service.embed_texts = AsyncMock(
+        side_effect=lambda texts: [[0.1, 0.2, 0.3, 0.4, 0.5] for _ in texts]
+    )
     service.cosine_similarity = MagicMock(return_value=0.85)
     return service
 
@@ -154,6 +157,10 @@ async def test_rag_service_retrieve_with_expansion():
     
     assert isinstance(result, RAGResult)
     # 扩展查询应能找到相关指南
+    assert guide in result.guides
+    # 所有扩展查询的嵌入通过一次批量请求获取
+    embedding_service.embed_texts.assert_awaited_once()
+    assert len(embedding_service.embed_texts.await_args.args[0]) == 4
 
 
 @pytest.mark.asyncio
@@ -0,0 +1,294 @@
+"""语音合成服务测试（使用 MockTransport，不调用API）"""
+
+import asyncio
+import json
+import os
+import sys
+
+import httpx
+import pytest
+
+from src.services.tts_service import TTSService, _mp3_duration
+
+
+def _make_handler(requests: list):
+    """返回以文本内容作为音频字节的模拟接口"""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        requests.append(body)
+        return httpx.Response(200, content=body["text"][0].encode())
+
+    return handler
+
+
+@pytest.fixture
+def tts(tmp_path, monkeypatch) -> TTSService:
+    # 播放方式与环境无关：默认走整句合成后播放，流式播放的测试单独开启
+    monkeypatch.setattr("src.services.tts_service._STREAM_PLAYBACK_AVAILABLE", False)
+    service = TTSService()
+    service._cache_dir = tmp_path / "tts_cache"
+    return service
+
+
+class TestSynthesize:
+    """语音合成测试"""
+
+    @pytest.mark.asyncio
+    async def test_initialize_warms_up_connection(self, tts, monkeypatch):
+        """测试初始化时在后台预热连接，且预热失败不影响初始化"""
+        methods = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            methods.append(request.method)
+            raise httpx.ConnectError("offline", request=request)
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        monkeypatch.setattr("src.utils.http_utils.get_shared_client", lambda: client)
+        try:
+            await tts.initialize()
+            await tts._warmup
+        finally:
+            await tts.close()
+            await client.aclose()
+
+        assert methods == ["HEAD"]
+
+    @pytest.mark.asyncio
+    async def test_repeated_text_uses_disk_cache(self, tts):
+        """测试相同文本和参数再次合成时读取磁盘缓存，参数变化时重新请求"""
+        requests = []
+        tts._client = httpx.AsyncClient(transport=httpx.MockTransport(_make_handler(requests)))
+        try:
+            first = await tts.synthesize("操作完成！")
+            # 新实例（模拟重启）从磁盘重建索引
+            restarted = TTSService()
+            restarted._cache_dir = tts._cache_dir
+            restarted._client = tts._client
+            second = await restarted.synthesize("操作完成！")
+            restarted.set_speed(1.5)
+            await restarted.synthesize("操作完成！")
+        finally:
+            await tts._client.aclose()
+
+        assert first == second == "操作完成！".encode()
+        assert len(requests) == 2
+        assert len(list(tts._cache_dir.glob("*.mp3"))) == 2
+
+    @pytest.mark.asyncio
+    async def test_memory_cache_skips_disk(self, tts, monkeypatch):
+        """测试会话内重复语句直接命中内存缓存，超出容量时淘汰最久未用的语音"""
+        requests = []
+        monkeypatch.setattr("src.services.tts_service._MEMORY_CACHE_MAX_BYTES", 20)
+        tts._client = httpx.AsyncClient(transport=httpx.MockTransport(_make_handler(requests)))
+        try:
+            await tts.synthesize("操作完成！")
+            for path in tts._cache_dir.glob("*.mp3"):
+                path.unlink()
+            repeated = await tts.synthesize("操作完成！")
+            await tts.synthesize("出了点问题")
+        finally:
+            await tts._client.aclose()
+
+        assert repeated == "操作完成！".encode()
+        assert len(requests) == 2
+        # 两句共 30 字节，超过 20 字节上限，只保留最近一句
+        assert list(tts._mem_cache.values()) == ["出了点问题".encode()]
+        assert tts._mem_bytes == 15
+
+    @pytest.mark.asyncio
+    async def test_concurrent_same_text_is_coalesced(self, tts):
+        """测试并发合成同一语句只发一次请求"""
+        requests = []
+        tts._client = httpx.AsyncClient(transport=httpx.MockTransport(_make_handler(requests)))
+        try:
+            results = await asyncio.gather(*(tts.synthesize("好的") for _ in range(3)))
+        finally:
+            await tts._client.aclose()
+
+        assert results == ["好的".encode()] * 3
+        assert len(requests) == 1
+        assert tts._inflight == {}
+
+    @pytest.mark.asyncio
+    async def test_synthesize_stream_yields_chunks_and_caches(self, tts):
+        """测试流式合成分块产出，完整接收后写入缓存"""
+        requests = []
+        tts._client = httpx.AsyncClient(transport=httpx.MockTransport(_make_handler(requests)))
+        try:
+            streamed = [chunk async for chunk in tts.synthesize_stream("请点击屏幕左下角的开始按钮")]
+            cached = await tts.synthesize("请点击屏幕左下角的开始按钮")
+        finally:
+            await tts._client.aclose()
+
+        assert b"".join(streamed) == cached == "请点击屏幕左下角的开始按钮".encode()
+        assert len(requests) == 1
+
+    @pytest.mark.asyncio
+    async def test_prefetch_overlaps_playback(self, tts):
+        """测试预合成任务在播放前一句时已完成合成"""
+        requests = []
+        played = []
+
+        async def fake_play(audio_data):
+            played.append((audio_data, len(requests)))
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(_make_handler(requests)))
+        tts._client = client
+        tts._play_audio = fake_play
+        try:
+            for task in tts.prefetch(["第一步", "第二步"]):
+                await tts.speak_prefetched(task)
+        finally:
+            await tts.close()
+            await client.aclose()
+
+        assert [audio for audio, _ in played] == ["第一步".encode(), "第二步".encode()]
+        # 播放第一句时两句都已发出合成请求
+        assert played[0][1] == 2
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="目录归属校验仅在 POSIX 上进行")
+class TestDiskCacheDir:
+    """磁盘缓存目录安全测试"""
+
+    @pytest.mark.asyncio
+    async def test_cache_dir_is_private(self, tts):
+        """测试缓存目录与文件仅当前用户可访问，已放宽的目录权限被收紧"""
+        tts._cache_dir.mkdir(mode=0o777)
+        os.chmod(tts._cache_dir, 0o777)
+        tts._client = httpx.AsyncClient(transport=httpx.MockTransport(_make_handler([])))
+        try:
+            await tts.synthesize("操作完成！")
+        finally:
+            await tts._client.aclose()
+
+        assert tts._cache_dir.stat().st_mode & 0o777 == 0o700
+        [cached] = tts._cache_dir.glob("*.mp3")
+        assert cached.stat().st_mode & 0o777 == 0o600
+
+    @pytest.mark.asyncio
+    async def test_symlinked_cache_dir_is_not_trusted(self, tts, tmp_path):
+        """测试缓存目录是符号链接时不读取其中预先放入的音频，也不写入"""
+        planted = tmp_path / "planted"
+        planted.mkdir()
+        key = tts._cache_key(tts._build_body("操作完成！"))
+        (planted / f"{key}.mp3").write_bytes(b"fake")
+        tts._cache_dir.symlink_to(planted, target_is_directory=True)
+        requests = []
+        tts._client = httpx.AsyncClient(transport=httpx.MockTransport(_make_handler(requests)))
+        try:
+            audio = await tts.synthesize("操作完成！")
+        finally:
+            await tts._client.aclose()
+
+        assert audio == "操作完成！".encode()
+        assert len(requests) == 1
+        assert [p.name for p in planted.iterdir()] == [f"{key}.mp3"]
+
+
+class TestMp3Duration:
+    """MP3 时长解析测试"""
+
+    def test_duration_from_frame_headers(self):
+        """测试按帧头累加时长（MPEG2 Layer III，128kbps，16kHz 单声道）"""
+        frame = bytes([0xFF, 0xF3, 0xC8, 0xC0]).ljust(576, b"\0")
+        id3 = b"ID3\x03\x00\x00\x00\x00\x00\x04" + b"TAG!"
+        assert _mp3_duration(frame * 50) == pytest.approx(1.8)
+        assert _mp3_duration(id3 + frame * 10) == pytest.approx(0.36)
+
+    def test_unparseable_data_uses_bitrate_estimate(self):
+        """测试无法解析帧头时按 128kbps 估算"""
+        assert _mp3_duration(b"\0" * 16000) == pytest.approx(1.0)
+
+
+class TestPlaybackQueue:
+    """播放队列测试"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_speak_is_not_dropped(self, tts):
+        """测试并发 speak 按顺序全部播放，不再丢弃"""
+        requests = []
+        played = []
+
+        async def fake_play(audio_data):
+            await asyncio.sleep(0.01)
+            played.append(audio_data.decode())
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(_make_handler(requests)))
+        tts._client = client
+        tts._play_audio = fake_play
+        try:
+            await asyncio.gather(tts.speak("好的"), tts.speak("第一步"), tts.speak("第二步"))
+        finally:
+            await tts.close()
+            await client.aclose()
+
+        assert played == ["好的", "第一步", "第二步"]
+
+    @pytest.mark.asyncio
+    async def test_cancelled_prefetch_is_skipped(self, tts):
+        """测试已取消的预合成任务被跳过，后续语音正常播放"""
+        played = []
+
+        async def fake_play(audio_data):
+            played.append(audio_data)
+
+        tts._play_audio = fake_play
+        pending = asyncio.get_running_loop().create_future()
+        cancelled = asyncio.ensure_future(pending)
+        cancelled.cancel()
+        ready = asyncio.ensure_future(asyncio.sleep(0, result=b"ok"))
+        try:
+            await tts.speak_prefetched(cancelled)
+            await tts.speak_prefetched(ready)
+        finally:
+            await tts.close()
+
+        assert played == [b"ok"]
+
+    @pytest.mark.asyncio
+    async def test_first_utterance_is_streamed(self, tts, monkeypatch):
+        """测试队列空闲时第一句边接收边交给 ffplay，后续语句整句播放"""
+        requests = []
+        streamed = bytearray()
+        played = []
+
+        class FakeStdin:
+            def write(self, chunk):
+                streamed.extend(chunk)
+
+            async def drain(self):
+                pass
+
+            def close(self):
+                pass
+
+        class FakeProcess:
+            returncode = None
+            stdin = FakeStdin()
+
+            async def wait(self):
+                self.returncode = 0
+
+        async def fake_exec(*args, **kwargs):
+            assert args[0] == "ffplay"
+            return FakeProcess()
+
+        async def fake_play(audio_data):
+            played.append(audio_data)
+
+        monkeypatch.setattr("src.services.tts_service._STREAM_PLAYBACK_AVAILABLE", True)
+        monkeypatch.setattr(asyncio, "create_subprocess_exec", fake_exec)
+        client = httpx.AsyncClient(transport=httpx.MockTransport(_make_handler(requests)))
+        tts._client = client
+        tts._play_audio = fake_play
+        try:
+            await asyncio.gather(tts.speak("好的"), tts.speak("第一步"))
+        finally:
+            await tts.close()
+            await client.aclose()
+
+        assert bytes(streamed) == "好的".encode()
+        assert played == ["第一步".encode()]
+        assert len(requests) == 2
@@ -0,0 +1,78 @@
+"""视觉服务解析与请求构建测试（使用 MockTransport，不调用API）"""
+
+import base64
+import json
+
+import httpx
+import pytest
+
+from src.services.vision_service import VisionService, VLConfig, image_data_url
+
+
+def _make_handler(requests: list, content: str):
+    """返回固定回复内容的模拟接口"""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert request.headers["Authorization"] == "Bearer test-key"
+        requests.append(json.loads(request.content))
+        return httpx.Response(200, json={"choices": [{"message": {"content": content}}]})
+
+    return handler
+
+
+@pytest.fixture
+def vision() -> VisionService:
+    return VisionService(VLConfig(api_key="test-key"))
+
+
+class TestImagePayload:
+    """图片请求体测试"""
+
+    @pytest.mark.asyncio
+    async def test_verify_step_sends_both_screenshots(self, vision):
+        """测试步骤验证按顺序发送操作前后两张截图的 data URL"""
+        requests = []
+        reply = '{"success": true, "matches_expected": true, "changes": "打开了窗口", "reason": "窗口已出现"}'
+
+        vision._client = httpx.AsyncClient(transport=httpx.MockTransport(_make_handler(requests, reply)))
+        try:
+            result = await vision.verify_step_completion(b"before", b"after", "点击开始", "打开开始菜单")
+        finally:
+            await vision._client.aclose()
+
+        assert result == (True, "打开了窗口", "窗口已出现")
+        urls = [part["image_url"]["url"] for part in requests[0]["messages"][0]["content"] if part["type"] == "image_url"]
+        assert urls == [
+            "data:image/png;base64," + base64.b64encode(b"before").decode("ascii"),
+            "data:image/png;base64," + base64.b64encode(b"after").decode("ascii"),
+        ]
+
+    def test_data_url_matches_image_format(self):
+        """测试 data URL 的类型与图片实际格式一致"""
+        assert image_data_url(b"\xff\xd8\xff\xe0jpeg").startswith("data:image/jpeg;base64,")
+        assert image_data_url(b"RIFF\x00\x00\x00\x00WEBPVP8 ").startswith("data:image/webp;base64,")
+        assert image_data_url(b"\x89PNG\r\n\x1a\n").startswith("data:image/png;base64,")
+
+
+class TestStateCache:
+    """页面状态分析缓存测试"""
+
+    @pytest.mark.asyncio
+    async def test_same_screenshot_and_intent_hits_cache(self, vision):
+        """测试相同截图和意图直接复用结果，截图或意图变化时重新请求"""
+        requests = []
+        reply = '{"app_name": "Windows桌面", "screen_state": "桌面", "page_status": "normal"}'
+
+        vision._client = httpx.AsyncClient(transport=httpx.MockTransport(_make_handler(requests, reply)))
+        try:
+            first = await vision.analyze_screen_state(b"desktop", "打开微信")
+            first.warnings.append("调用方修改")
+            second = await vision.analyze_screen_state(b"desktop", "打开微信")
+            await vision.analyze_screen_state(b"desktop", "打开浏览器")
+            await vision.analyze_screen_state(b"wechat", "打开微信")
+        finally:
+            await vision._client.aclose()
+
+        assert second.app_name == "Windows桌面"
+        assert second.warnings == []
+        assert len(requests) == 3